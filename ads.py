@@ -1,5 +1,10 @@
+import asyncio
 from typing import Dict, List
 import logging
+from market_ad import MarketAd, parse_snapshot
+from market_cache import get_market_cache
+from payment_index import index_payments
+import runtime_stats
 
 logger = logging.getLogger(__name__)
 
@@ -10,9 +15,9 @@ def has_flag(ad: Dict, flag: str) -> bool:
     """
     return flag.lower() in str(ad.get("remark", "")).lower().split()
 
-def get_my_ads(api, config, side: str) -> List[Dict]:
+async def get_my_ads(api, config, side: str) -> List[Dict]:
     try:
-        response = api.get_ads_list(
+        response = await api.get_ads_list(
             tokenId=config["p2p"]["token"],
             currency_id=config["p2p"]["currency"],
             side=config["p2p"]["side_codes"][side.upper()]
@@ -22,51 +27,152 @@ def get_my_ads(api, config, side: str) -> List[Dict]:
         logger.error(f"Failed to fetch my {side} ads: {e}")
         return []
 
-def fetch_market_ads(api, side: str, config: Dict, max_pages: int = 5) -> List[Dict]:
-    try:
-        side_code = config["p2p"]["side_codes"][side.upper()]
-        token = config["p2p"]["token"]
-        currency = config["p2p"]["currency"]
-        size = config["p2p"]["page_size"]
-
-        all_ads = []
-        for page in range(1, max_pages + 1):
-            resp = api.get_online_ads(
-                tokenId=str(token),
-                currencyId=str(currency),
-                side=str(side_code),
+async def _fetch_market_pages(api, token: str, currency: str, side_code: str, size: int,
+                              fan_out: int, max_pages: int) -> List[Dict]:
+    """
+    Сторінки 1..max_pages запитуються паралельно (не більше fan_out
+    одночасно) і склеюються в порядку сторінок. Щойно прийшла неповна
+    сторінка — запити за наступними сторінками скасовуються.
+    """
+    semaphore = asyncio.Semaphore(fan_out)
+    tasks: Dict[int, asyncio.Task] = {}
+
+    async def fetch_page(page: int) -> List[Dict]:
+        async with semaphore:
+            resp = await api.get_online_ads(
+                tokenId=token,
+                currencyId=currency,
+                side=side_code,
                 page=str(page),
                 size=str(size)
             )
-            items = resp.get("result", {}).get("items", [])
+        items = resp.get("result", {}).get("items", [])
+        if len(items) < size:
+            for later_page, task in tasks.items():
+                if later_page > page:
+                    task.cancel()
+        return items
+
+    for page in range(1, max_pages + 1):
+        tasks[page] = asyncio.create_task(fetch_page(page))
+
+    all_ads = []
+    try:
+        for page in sorted(tasks):
+            items = await tasks[page]
             all_ads.extend(items)
-            if len(items) < int(size):
+            if len(items) < size:
                 break
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    return all_ads
+
+async def fetch_market_snapshot(api, config: Dict, side: str, max_pages: int = 5,
+                                allow_stale: bool = True) -> List[Dict]:
+    """
+    Повний знімок ринку сторони (разом з моїми оголошеннями) через спільний
+    MarketCache: всі споживачі в межах ttl отримують той самий список.
+    allow_stale=False — лише свіжий знімок (молодший за ttl).
+    max_pages входить у ключ кешу: мілкий запит не віддасть свій знімок
+    глибшому і навпаки.
+    payments кожного оголошення кодуються в бітову маску (payment_index)
+    один раз при завантаженні. Помилки API пробрасуються.
+    """
+    token = str(config["p2p"]["token"])
+    currency = str(config["p2p"]["currency"])
+    side_code = str(config["p2p"]["side_codes"][side.upper()])
+    size = int(config["p2p"]["page_size"])
+    fan_out = int(config["p2p"].get("page_fan_out", 3))
+
+    return await get_market_cache(config).get(
+        (token, currency, side_code, max_pages),
+        lambda: _load_indexed(api, token, currency, side_code, size, fan_out, max_pages),
+        allow_stale=allow_stale,
+    )
+
+async def _load_indexed(api, token: str, currency: str, side_code: str, size: int,
+                        fan_out: int, max_pages: int) -> List[Dict]:
+    return index_payments(await _fetch_market_pages(api, token, currency, side_code, size, fan_out, max_pages))
 
+async def fetch_market_ads(api, side: str, config: Dict, max_pages: int = 5) -> List[MarketAd]:
+    """
+    Ринок без моїх оголошень, розібраний у MarketAd (раз на знімок).
+    Репрайсинг рахує ціну лише по свіжому знімку — старий не віддається.
+    """
+    try:
+        all_ads = await fetch_market_snapshot(api, config, side, max_pages, allow_stale=False)
         my_uid = str(config["p2p"]["my_uid"])
-        return [ad for ad in all_ads if str(ad.get("userId", "")) != my_uid]
+        return [ad for ad, raw in zip(parse_snapshot(all_ads), all_ads) if str(raw.get("userId", "")) != my_uid]
 
     except Exception as e:
         logger.error(f"Failed to fetch {side} ads: {e}")
         return []
 
-def update_ad_dynamic(api, ad: Dict, price: float | None = None, quantity: float | None = None):
+# Лічильники update_ad: скільки запитів реально пішло, а скільки пропущено як no-op
+update_stats = {"sent": 0, "skipped": 0, "failed": 0}
+runtime_stats.register("update_ad", update_stats)
+
+def _same_number(a, b) -> bool:
+    try:
+        return abs(float(a) - float(b)) < 1e-9
+    except (TypeError, ValueError):
+        return False
+
+def ad_needs_update(ad: Dict, price, quantity, min_amount, max_amount, payment_ids: List) -> bool:
+    """
+    Порівнює бажані параметри з живим оголошенням.
+    Неактивне оголошення (status != 10) оновлюємо завжди — це його активація.
+    """
+    if ad.get("status") != 10:
+        return True
+
+    live_payment_ids = sorted(str(term["id"]) for term in ad.get("paymentTerms", []))
+    return not (
+        _same_number(price, ad.get("price"))
+        and _same_number(quantity, ad.get("quantity"))
+        and _same_number(min_amount, ad.get("minAmount"))
+        and _same_number(max_amount, ad.get("maxAmount"))
+        and sorted(str(p) for p in payment_ids) == live_payment_ids
+    )
+
+async def update_ad_dynamic(api, ad: Dict, price: float | None = None, quantity: float | None = None,
+                            min_amount=None, max_amount=None, payment_ids: List | None = None) -> bool:
+    """Оновлює оголошення, якщо щось змінилось. Повертає True, якщо update_ad було відправлено."""
     ad_id = ad["id"]
+    price = price if price is not None else float(ad.get("price", 0))
+    quantity = quantity if quantity is not None else float(ad.get("quantity", 0))
+    min_amount = min_amount if min_amount is not None else ad["minAmount"]
+    max_amount = max_amount if max_amount is not None else ad["maxAmount"]
+    payment_ids = payment_ids if payment_ids is not None else [term["id"] for term in ad.get("paymentTerms", [])]
+
+    if not ad_needs_update(ad, price, quantity, min_amount, max_amount, payment_ids):
+        update_stats["skipped"] += 1
+        logger.info(f"⏭ Ad {ad_id} unchanged (price={price} quantity={quantity}), skipping update "
+                    f"[sent={update_stats['sent']} skipped={update_stats['skipped']}]")
+        return False
+
     try:
         logger.info(f"✏️ Updating ad {ad_id} with price={price} quantity={quantity}")
-        api.update_ad(
+        await api.update_ad(
             id=ad_id,
             priceType=0,
             premium="0",
-            price=price if price is not None else float(ad.get("price", 0)),
-            quantity=quantity if quantity is not None else float(ad.get("quantity", 0)),
-            minAmount=ad["minAmount"],
-            maxAmount=ad["maxAmount"],
+            price=price,
+            quantity=quantity,
+            minAmount=min_amount,
+            maxAmount=max_amount,
             remark=ad["remark"],
             tradingPreferenceSet=ad["tradingPreferenceSet"],
-            paymentIds=[term["id"] for term in ad.get("paymentTerms", [])],
+            paymentIds=payment_ids,
             actionType="MODIFY" if ad["status"] == 10 else "ACTIVE",
             paymentPeriod=ad["paymentPeriod"]
         )
+        update_stats["sent"] += 1
+        return True
     except Exception as e:
-        logger.error(f"❌ Failed to update ad {ad_id}: {e}")
\ No newline at end of file
+        update_stats["failed"] += 1
+        logger.error(f"❌ Failed to update ad {ad_id}: {e}")
+        return False
@@ -1,28 +1,24 @@
 import json
 import os
+from ads import fetch_market_snapshot
+from payment_index import payment_mask, payment_registry
 
 
-def fetch_filtered_competitor_ads(api, payment_map: dict, pages: int = 5) -> list:
+async def fetch_filtered_competitor_ads(api, config: dict, payment_map: dict, pages: int = 5) -> list:
     payment_type_to_name = {
         val["paymentType"]: val["paymentName"]
         for val in payment_map.values()
         if "paymentType" in val and "paymentName" in val
     }
 
-    all_items = []
-    for page in range(1, pages + 1):
-        data = api.get_online_ads(tokenId="USDT", currencyId="PLN", side='1', page=str(page))
-        items = data.get("result", {}).get("items", [])
-        if not items:
-            break
-        all_items.extend(items)
+    all_items = await fetch_market_snapshot(api, config, "SELL", max_pages=pages)
+    known_mask = payment_registry.query(payment_type_to_name)
 
     filtered = []
     for ad in all_items:
-        payment_types = ad.get("payments", [])
-        matching = [pt for pt in payment_types if pt in payment_type_to_name]
-        if not matching:
+        if not payment_mask(ad) & known_mask:
             continue
+        matching = [pt for pt in ad.get("payments", []) if pt in payment_type_to_name]
 
         filtered.append({
             "id": ad.get("id"),
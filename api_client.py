@@ -1,4 +1,24 @@
+import asyncio
+import functools
+import hashlib
+import hmac
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime as dt, timezone
+
+import aiofiles
+import aiohttp
 from bybit_p2p import P2P
+from bybit_p2p._exceptions import FailedRequestError
+from bybit_p2p._p2p_helper import P2PMethods
+from bybit_p2p._p2p_manager import P2PManager
+
+import runtime_stats
+from rate_limit import RATE_LIMIT_CODES, RateGovernor
+
+logger = logging.getLogger(__name__)
 
 def get_api(config):
     return P2P(
@@ -8,3 +28,293 @@ def get_api(config):
         recv_window=20000
     )
 
+class AsyncApiBase:
+    """Спільний облік часу викликів і rate limit для async-клієнтів"""
+
+    def __init__(self, governor: RateGovernor | None = None):
+        self.stats: dict[str, dict] = {}
+        self.governor = governor
+
+    async def _throttle(self, name: str):
+        if self.governor is not None:
+            await self.governor.acquire(name)
+
+    def _check_rate_limit(self, name: str, error: FailedRequestError):
+        if self.governor is not None and error.status_code in RATE_LIMIT_CODES:
+            self.governor.backoff(name)
+
+    def _record(self, name: str, elapsed: float, ok: bool):
+        s = self.stats.setdefault(name, {"calls": 0, "errors": 0, "total_time": 0.0, "max_time": 0.0})
+        s["calls"] += 1
+        s["errors"] += 0 if ok else 1
+        s["total_time"] += elapsed
+        s["max_time"] = max(s["max_time"], elapsed)
+        logger.debug(f"[API] {name} took {elapsed:.3f}s (ok={ok})")
+
+class AsyncP2P(AsyncApiBase):
+    """
+    Async-фасад над синхронним bybit_p2p.P2P.
+
+    Має ті самі методи (get_online_ads, update_ad, ...), але вони повертають
+    awaitable. Кожен виклик іде в окремий пул потоків обмеженого розміру,
+    тож event loop (і Telegram-бот) не блокується, а кількість одночасних
+    HTTP-запитів до Bybit обмежена max_workers.
+
+    Скасування: якщо задачу скасовано до старту виклику, запит не піде взагалі;
+    якщо він уже виконується в потоці — результат просто відкидається.
+    """
+
+    def __init__(self, api: P2P, max_workers: int = 8, timeout: float | None = 30.0,
+                 governor: RateGovernor | None = None):
+        super().__init__(governor)
+        self.sync = api
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="p2p")
+
+    def __getattr__(self, name):
+        attr = getattr(self.sync, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, timeout: float | None = ..., **kwargs):
+            return await self._call(name, attr, args, kwargs, timeout)
+
+        return call
+
+    async def run(self, func, *args, timeout: float | None = ..., **kwargs):
+        """Виконує довільну блокуючу функцію в тому ж пулі (без rate limit)"""
+        name = getattr(func, "__name__", repr(func))
+        return await self._call(name, func, args, kwargs, timeout, throttle=False)
+
+    async def _call(self, name: str, func, args: tuple, kwargs: dict, timeout, throttle: bool = True):
+        if timeout is ...:
+            timeout = self.timeout
+        if throttle:
+            await self._throttle(name)
+
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        ok = False
+        try:
+            future = loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+            result = await asyncio.wait_for(future, timeout)
+            ok = True
+            return result
+        except asyncio.TimeoutError:
+            logger.error(f"⏱ {name} timed out after {timeout}s")
+            raise
+        except FailedRequestError as e:
+            self._check_rate_limit(name, e)
+            raise
+        finally:
+            self._record(name, time.perf_counter() - started, ok)
+
+    async def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+class AiohttpP2P(AsyncApiBase):
+    """
+    Нативний async-клієнт Bybit P2P на aiohttp.
+
+    Реалізує лише ті ендпоінти, якими користується бот. Підпис і формат
+    payload ті самі, що в bybit_p2p (HMAC-SHA256), помилки — FailedRequestError.
+    Одна ClientSession з keep-alive пулом на весь процес: без потоків
+    і без нового TLS-handshake на кожен запит.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        api_secret: str,
+        testnet: bool = False,
+        recv_window: int = 20000,
+        pool_size: int = 10,
+        keepalive_timeout: float = 30.0,
+        timeout: float = 30.0,
+        governor: RateGovernor | None = None,
+    ):
+        super().__init__(governor)
+        self._api_key = api_key
+        self._api_secret = api_secret
+        self._recv_window = recv_window
+        self._url = "https://api-testnet.bybit.com" if testnet else "https://api.bybit.com"
+        self._pool_size = pool_size
+        self._keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self._session: aiohttp.ClientSession | None = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Сесію створюємо ліниво — вона має належати робочому event loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self._pool_size,
+                keepalive_timeout=self._keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={"Accept": "application/json"},
+            )
+        return self._session
+
+    def _sign(self, payload: bytes, timestamp: int) -> str:
+        sign_string = f"{timestamp}{self._api_key}{self._recv_window}".encode() + payload
+        return hmac.new(self._api_secret.encode("utf-8"), sign_string, hashlib.sha256).hexdigest()
+
+    async def _request(self, name: str, method, params: dict, timeout: float | None = None):
+        missing = [p for p in method.required_params if p not in params]
+        if missing:
+            raise ValueError(f"Missing required parameters: {', '.join(missing)}")
+
+        # Як у bybit_p2p: 10.0 -> 10, інакше підпис не зійдеться
+        for k, v in params.items():
+            if isinstance(v, float) and v == int(v):
+                params[k] = int(v)
+
+        url = self._url + method.url
+        content_type = "application/json"
+
+        if method.http_method == "FILE":
+            filepath = params["upload_file"]
+            filename = os.path.basename(str(filepath))
+            boundary = "boundary-for-file"
+            content_type = f"multipart/form-data; boundary={boundary}"
+            async with aiofiles.open(filepath, "rb") as f:
+                binary_data = await f.read()
+            body = (
+                f"--{boundary}\r\n"
+                f"Content-Disposition: form-data; name=\"upload_file\"; filename=\"{filename}\"\r\n"
+                f"Content-Type: image/png\r\n\r\n"
+            ).encode() + binary_data + f"\r\n--{boundary}--\r\n".encode()
+            request_payload = ""
+        else:
+            request_payload = P2PManager._generate_payload(method.http_method, params)
+            body = request_payload.encode("utf-8")
+
+        if method.http_method == "GET":
+            http_method, data = "GET", None
+            if request_payload:
+                url += f"?{request_payload}"
+        else:
+            http_method, data = "POST", body
+
+        # Спершу токен rate limit, потім підпис: governor може тримати виклик
+        # довго, а підписаний timestamp старіє і за recv_window Bybit його відхилить
+        await self._throttle(name)
+        timestamp = int(time.time() * 10 ** 3)
+        headers = {
+            "X-BAPI-API-KEY": self._api_key,
+            "X-BAPI-SIGN": self._sign(body, timestamp),
+            "X-BAPI-SIGN-TYPE": "2",
+            "X-BAPI-TIMESTAMP": str(timestamp),
+            "X-BAPI-RECV-WINDOW": str(self._recv_window),
+            "Content-Type": content_type,
+        }
+        started = time.perf_counter()
+        ok = False
+        try:
+            async with self._get_session().request(
+                http_method,
+                url,
+                data=data,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=timeout or self.timeout),
+            ) as resp:
+                if resp.status != 200:
+                    raise self._error(url, request_payload, f"HTTP status code is: {resp.status}, expected: 200", resp.status, resp.headers)
+                try:
+                    result = await resp.json(content_type=None)
+                except ValueError:
+                    raise self._error(url, request_payload, "Could not decode JSON.", resp.status, resp.headers)
+
+            ret_code = "retCode" if "retCode" in result else "ret_code"
+            ret_msg = "retMsg" if "retMsg" in result else "ret_msg"
+            if result.get(ret_code):
+                logger.error(f"{result.get(ret_msg)} (ErrCode: {result[ret_code]})")
+                raise self._error(url, request_payload, result.get(ret_msg, ""), result[ret_code], resp.headers)
+
+            ok = True
+            return result
+        except FailedRequestError as e:
+            self._check_rate_limit(name, e)
+            raise
+        finally:
+            self._record(name, time.perf_counter() - started, ok)
+
+    @staticmethod
+    def _error(url, payload, message, status_code, headers) -> FailedRequestError:
+        return FailedRequestError(
+            request=f"{url}: {payload}",
+            message=message,
+            status_code=status_code,
+            time=dt.now(timezone.utc).strftime("%H:%M:%S"),
+            resp_headers=headers,
+        )
+
+    async def get_online_ads(self, timeout: float | None = None, **kwargs):
+        return await self._request("get_online_ads", P2PMethods.GET_ONLINE_ADS, kwargs, timeout)
+
+    async def get_ads_list(self, timeout: float | None = None, **kwargs):
+        return await self._request("get_ads_list", P2PMethods.GET_ADS_LIST, kwargs, timeout)
+
+    async def update_ad(self, timeout: float | None = None, **kwargs):
+        return await self._request("update_ad", P2PMethods.UPDATE_AD, kwargs, timeout)
+
+    async def get_pending_orders(self, timeout: float | None = None, **kwargs):
+        return await self._request("get_pending_orders", P2PMethods.GET_PENDING_ORDERS, kwargs, timeout)
+
+    async def get_order_details(self, timeout: float | None = None, **kwargs):
+        return await self._request("get_order_details", P2PMethods.GET_ORDER_DETAILS, kwargs, timeout)
+
+    async def send_chat_message(self, timeout: float | None = None, **kwargs):
+        return await self._request("send_chat_message", P2PMethods.SEND_CHAT_MESSAGE, kwargs, timeout)
+
+    async def upload_chat_file(self, timeout: float | None = None, **kwargs):
+        return await self._request("upload_chat_file", P2PMethods.UPLOAD_CHAT_FILE, kwargs, timeout)
+
+    async def mark_as_paid(self, timeout: float | None = None, **kwargs):
+        return await self._request("mark_as_paid", P2PMethods.MARK_AS_PAID, kwargs, timeout)
+
+    async def get_current_balance(self, timeout: float | None = None, **kwargs):
+        return await self._request("get_current_balance", P2PMethods.GET_CURRENT_BALANCE, kwargs, timeout)
+
+    async def get_user_payment_types(self, timeout: float | None = None, **kwargs):
+        return await self._request("get_user_payment_types", P2PMethods.GET_USER_PAYMENT_TYPES, kwargs, timeout)
+
+    async def run(self, func, *args, **kwargs):
+        """Сумісність з AsyncP2P: блокуючі функції — у дефолтний пул"""
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+def get_async_api(config) -> AsyncP2P | AiohttpP2P:
+    """
+    bybit.client: "bybit_p2p" (за замовчуванням) — AsyncP2P поверх бібліотеки,
+    "aiohttp" — нативний AiohttpP2P.
+    """
+    bybit_cfg = config["bybit"]
+    timeout = float(bybit_cfg.get("call_timeout", 30))
+    governor = RateGovernor.from_config(config)
+    runtime_stats.register("rate_limit", governor.stats)
+
+    if bybit_cfg.get("client", "bybit_p2p") == "aiohttp":
+        client = AiohttpP2P(
+            api_key=bybit_cfg["api_key"],
+            api_secret=bybit_cfg["api_secret"],
+            testnet=bybit_cfg["testnet"],
+            pool_size=int(bybit_cfg.get("pool_size", 10)),
+            keepalive_timeout=float(bybit_cfg.get("keepalive_timeout", 30)),
+            timeout=timeout,
+            governor=governor,
+        )
+    else:
+        client = AsyncP2P(
+            get_api(config),
+            max_workers=int(bybit_cfg.get("max_workers", 8)),
+            timeout=timeout,
+            governor=governor,
+        )
+    runtime_stats.register("api", client.stats)
+    return client
@@ -1,13 +1,14 @@
+import asyncio
 
 
 from typing import Dict
 from venv import logger
 
-def get_pending_orders(api, token: str) -> list:
+async def get_pending_orders(api, token: str) -> list:
     """
     Get pending orders for a specific side (0 = BUY, 1 = SELL)
     """
-    response = api.get_pending_orders(
+    response = await api.get_pending_orders(
         page=1,
         size=10,
         tokenId=token,
@@ -17,9 +18,9 @@ def get_pending_orders(api, token: str) -> list:
 
     return response
 
-def get_SELL_balance(api, token: str) -> float:
+async def get_SELL_balance(api, token: str) -> float:
     try:
-        response = api.get_current_balance(accountType="FUND")
+        response = await api.get_current_balance(accountType="FUND")
         balances = response.get("result", {}).get("balance", [])
         for item in balances:
             if item.get("coin") == token:
@@ -32,10 +33,12 @@ def get_SELL_balance(api, token: str) -> float:
         logger.error(f"Failed to get balance: {e}")
         return 0.0
 
-def get_BUY_balance(api, token: str, total: float) -> float:
+async def get_BUY_balance(api, token: str, total: float) -> float:
     try:
-        transfer_balance = get_SELL_balance(api, token)
-        orders = get_pending_orders(api, token)
+        transfer_balance, orders = await asyncio.gather(
+            get_SELL_balance(api, token),
+            get_pending_orders(api, token),
+        )
         active_volume = sum(
             float(o.get("notifyTokenQuantity", 0)) for o in orders
         )
@@ -1,7 +1,14 @@
 # calc_price.py
 
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
 from pprint import pprint
 
+from market_ad import MarketAd, as_market_ads
+from payment_index import payment_registry
+from remark_filter import get_matcher
+
 import logging
 logger = logging.getLogger(__name__)
 
@@ -15,96 +22,191 @@ def to_float(value):
 # ДОПОМІЖНІ ФУНКЦІЇ ТА ПРАВИЛА ВАЛІДАЦІЇ
 # =======================================================================
 
-def _is_ad_acceptable(ad: dict, cfg: dict) -> bool:
-
-
-    ALL_RULES = [
-        {
-            'name': 'Minimum Total Orders',
-            'is_active': lambda ad, cfg: cfg.get('check_orderNum', False),
-            'is_valid': lambda ad, cfg: to_float(ad.get('recentOrderNum', 0)) > to_float(cfg.get('min_total_orders', 0)),
-        },
-        {
-            'name': 'Payment Methods',
-            'is_active': lambda ad, cfg: cfg.get('check_payment_methods', False),
-            'is_valid': lambda ad, cfg: (
-                len(
-                    set(cfg.get('allowed_payment_types', [])).intersection(set(ad.get('payments', [])))
-                ) >= min(
-                    to_float(cfg.get('min_payment_matches', 1)),
-                    len(cfg.get('allowed_payment_types', []))
-                )
-            ),
-        },
-        {
-            'name': 'Minimum Balance',
-            'is_active': lambda ad, cfg: cfg.get('check_min_balance', False),
-            'is_valid': lambda ad, cfg: to_float(ad.get('lastQuantity')) >= to_float(cfg.get('min_amount_threshold', 0)),
-        },
-        {
-            'name': 'Minimum Limit',
-            'is_active': lambda ad, cfg: cfg.get('check_min_limit', False),
-            'is_valid': lambda ad, cfg: to_float(ad.get('minAmount')) <= to_float(cfg.get('min_limit_threshold', float('inf'))),
-        },
-        {
-            'name': 'Limit Range',
-            'is_active': lambda ad, cfg: cfg.get('check_limit_range', False),
-            'is_valid': lambda ad, cfg: (to_float(ad.get('maxAmount')) - to_float(ad.get('minAmount'))) >= to_float(cfg.get('min_limit_range', 0)),
-        },
-        {
-            'name': 'Advertiser Register Time',
-            'is_active': lambda ad, cfg: cfg.get('check_register_days', False) and ad.get('tradingPreferenceSet', {}).get('hasRegisterTime') == 1,
-            'is_valid': lambda ad, cfg: to_float(ad.get('tradingPreferenceSet', {}).get('registerTimeThreshold')) <= to_float(cfg.get('min_register_days', float('inf'))),
-        },
-        {
-            'name': 'Advertiser Order Count',
-            'is_active': lambda ad, cfg: cfg.get('check_min_orders', False) and ad.get('tradingPreferenceSet', {}).get('hasOrderFinishNumberDay30') == 1,
-            'is_valid': lambda ad, cfg: to_float(ad.get('tradingPreferenceSet', {}).get('orderFinishNumberDay30')) <= to_float(cfg.get('min_order_count', float('inf'))),
-        },
-        {
-            'name': 'Country Whitelist',
-            'is_active': lambda ad, cfg: cfg.get('check_country_whitelist', False),
-            'is_valid': lambda ad, cfg: (
-                ad.get('tradingPreferenceSet', {}).get('hasNationalLimit') != 1 or
-                not set(cfg.get('country_whitelist', [])).isdisjoint(set(ad.get('tradingPreferenceSet', {}).get('nationalLimit', [])))
-            ),
-        },
-        {
-            'name': 'Remark Blacklist',
-            'is_active': lambda ad, cfg: cfg.get('check_remark_blacklist', False),
-            'is_valid': lambda ad, cfg: not any(
-                word in ad.get('remark', '').lower()
-                for word in cfg.get('remark_blacklist', [])
-            ),
-        },
-        {
-            'name': 'Nickname Blacklist',
-            'is_active': lambda ad, cfg: cfg.get('check_exclude_nicknames', False),
-            'is_valid': lambda ad, cfg: ad.get('nickName') not in cfg.get('exclude_nicknames', []),
-        },
-        {
-            'name': 'Min Price Delta from BUY (SELL only)',
-            'is_active': lambda ad, cfg: cfg.get('check_sell_vs_buy_gap', False) and cfg.get('side') == 'SELL',
-            'is_valid': lambda ad, cfg: (
-                to_float(ad.get("price", 0)) >= to_float(cfg.get("reference_buy_price", 0)) * (1 + to_float(cfg.get("min_gap_percent", 0.015)))
-            ),
-        },
-    ]
-
-
-    for rule in ALL_RULES:
-        if rule['is_active'](ad, cfg):
-            if not rule['is_valid'](ad, cfg):
+# Кожне правило компілюється з конфігу один раз: пороги вже float,
+# списки — frozenset/tuple. Фабрика повертає предикат MarketAd -> bool
+# або None, якщо правило неактивне для цього конфігу.
+
+def _rule_min_total_orders(cfg):
+    threshold = to_float(cfg.get('min_total_orders', 0))
+    return lambda ad: ad.recent_order_num > threshold
+
+def _rule_payment_methods(cfg):
+    # Перетин через бітові маски з payment_index: payments кожного
+    # оголошення закодовані один раз при завантаженні знімку. Дозволені
+    # типи реєструємо (encode), бо правило компілюється й кешується раніше,
+    # ніж тип може вперше з'явитись на ринку
+    allowed_list = cfg.get('allowed_payment_types', [])
+    allowed = payment_registry.encode(allowed_list)
+    required = min(to_float(cfg.get('min_payment_matches', 1)), len(allowed_list))
+    return lambda ad: (ad.payment_mask & allowed).bit_count() >= required
+
+def _rule_min_balance(cfg):
+    threshold = to_float(cfg.get('min_amount_threshold', 0))
+    return lambda ad: ad.last_quantity >= threshold
+
+def _rule_min_limit(cfg):
+    threshold = to_float(cfg.get('min_limit_threshold', float('inf')))
+    return lambda ad: ad.min_amount <= threshold
+
+def _rule_limit_range(cfg):
+    threshold = to_float(cfg.get('min_limit_range', 0))
+    return lambda ad: (ad.max_amount - ad.min_amount) >= threshold
+
+def _rule_register_time(cfg):
+    threshold = to_float(cfg.get('min_register_days', float('inf')))
+    return lambda ad: not ad.has_register_time or ad.register_time <= threshold
+
+def _rule_order_count(cfg):
+    threshold = to_float(cfg.get('min_order_count', float('inf')))
+    return lambda ad: not ad.has_order_finish or ad.order_finish_30 <= threshold
+
+def _rule_country_whitelist(cfg):
+    whitelist = frozenset(cfg.get('country_whitelist', []))
+    return lambda ad: not ad.has_national_limit or not whitelist.isdisjoint(ad.national_limit)
+
+def _rule_remark_blacklist(cfg):
+    matcher = get_matcher(cfg.get('remark_blacklist', []))
+    return lambda ad: matcher.is_clean(ad.id, ad.remark)
+
+def _rule_exclude_nicknames(cfg):
+    excluded = frozenset(cfg.get('exclude_nicknames', []))
+    return lambda ad: ad.nick_name not in excluded
+
+def _rule_sell_vs_buy_gap(cfg):
+    if cfg.get('side') != 'SELL':
+        return None
+    min_price = to_float(cfg.get("reference_buy_price", 0)) * (1 + to_float(cfg.get("min_gap_percent", 0.015)))
+    return lambda ad: ad.price >= min_price
+
+# (назва, прапорець у конфігу, фабрика предиката) — у порядку перевірки
+ALL_RULES = [
+    ('Minimum Total Orders', 'check_orderNum', _rule_min_total_orders),
+    ('Payment Methods', 'check_payment_methods', _rule_payment_methods),
+    ('Minimum Balance', 'check_min_balance', _rule_min_balance),
+    ('Minimum Limit', 'check_min_limit', _rule_min_limit),
+    ('Limit Range', 'check_limit_range', _rule_limit_range),
+    ('Advertiser Register Time', 'check_register_days', _rule_register_time),
+    ('Advertiser Order Count', 'check_min_orders', _rule_order_count),
+    ('Country Whitelist', 'check_country_whitelist', _rule_country_whitelist),
+    ('Remark Blacklist', 'check_remark_blacklist', _rule_remark_blacklist),
+    ('Nickname Blacklist', 'check_exclude_nicknames', _rule_exclude_nicknames),
+    ('Min Price Delta from BUY (SELL only)', 'check_sell_vs_buy_gap', _rule_sell_vs_buy_gap),
+]
+
+class CompiledRules:
+    """Ланцюжок активних правил для одного конфігу сторони"""
+
+    __slots__ = ("rules",)
+
+    def __init__(self, cfg: dict):
+        self.rules = []
+        for name, flag, factory in ALL_RULES:
+            if not cfg.get(flag, False):
+                continue
+            predicate = factory(cfg)
+            if predicate is not None:
+                self.rules.append((name, predicate))
+
+    def __call__(self, ad: dict) -> bool:
+        for _, predicate in self.rules:
+            if not predicate(ad):
                 return False
-    return True
+        return True
+
+    def profiled(self, ad: dict, counters: list) -> bool:
+        """Те саме, що __call__, але рахує [checked, rejected, time] для кожного правила"""
+        for (_, predicate), counter in zip(self.rules, counters):
+            started = time.perf_counter()
+            accepted = predicate(ad)
+            counter[2] += time.perf_counter() - started
+            counter[0] += 1
+            if not accepted:
+                counter[1] += 1
+                return False
+        return True
+
+    def reorder(self, rank):
+        """Сортує правила за rank(name) — результат фільтра від порядку не залежить"""
+        self.rules.sort(key=lambda rule: rank(rule[0]))
+
+class FilterStats:
+    """
+    Лічильники правил фільтра по сторонах: скільки оголошень правило
+    перевірило, скільки відсіяло і скільки часу на це пішло.
+    tick — з початку поточного тіку (start_tick), total — за весь час.
+
+    Через short-circuit правило бачить лише ті оголошення, що пройшли
+    попередні, тож rejected — умовна відсіювальність у поточному порядку.
+    """
+
+    def __init__(self):
+        self.tick: dict = {}
+        self.total: dict = {}
+
+    def start_tick(self, side: str):
+        self.tick[side] = {}
+
+    def record(self, side: str, name: str, checked: int, rejected: int, elapsed: float):
+        for scope in (self.tick, self.total):
+            s = scope.setdefault(side, {}).setdefault(name, {"checked": 0, "rejected": 0, "time": 0.0})
+            s["checked"] += checked
+            s["rejected"] += rejected
+            s["time"] += elapsed
+
+    def rank(self, side: str, name: str) -> float:
+        """
+        Середня ціна перевірки / частка відсіяних: менше — раніше в ланцюжку.
+        Ще не виміряні правила йдуть першими, щоб отримати статистику.
+        """
+        s = self.total.get(side, {}).get(name)
+        if not s or not s["checked"]:
+            return 0.0
+        if not s["rejected"]:
+            return float("inf")
+        return (s["time"] / s["checked"]) / (s["rejected"] / s["checked"])
+
+    def log_tick(self, side: str):
+        for name, s in self.tick.get(side, {}).items():
+            logger.info(
+                f"📊 [{side}] {name}: rejected {s['rejected']}/{s['checked']} "
+                f"in {s['time'] * 1000:.2f} ms"
+            )
+
+filter_stats = FilterStats()
+
+_COMPILED_CACHE_SIZE = 64
+_compiled_rules: "OrderedDict[tuple, CompiledRules]" = OrderedDict()
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+def compile_rules(cfg: dict) -> CompiledRules:
+    """Компілює правила для конфігу; той самий за змістом конфіг — той самий ланцюжок"""
+    key = _freeze(cfg)
+    compiled = _compiled_rules.get(key)
+    if compiled is None:
+        compiled = _compiled_rules[key] = CompiledRules(cfg)
+        if len(_compiled_rules) > _COMPILED_CACHE_SIZE:
+            _compiled_rules.popitem(last=False)
+    else:
+        _compiled_rules.move_to_end(key)
+    return compiled
+
+def _is_ad_acceptable(ad: MarketAd, cfg: dict) -> bool:
+    return compile_rules(cfg)(ad)
 
 def _find_neighbor_price(ad, all_ads, gap, side_code):
-    ad_price = float(ad['price'])
-    ad_owner = ad['nickName']
+    """Лінійний пошук сусіда — еталон для NeighborIndex (tools/bench_neighbors.py)"""
+    ad_price = ad.price
+    ad_owner = ad.nick_name
     for neighbor in all_ads:
-        if neighbor['nickName'] == ad_owner:
+        if neighbor.nick_name == ad_owner:
             continue
-        neighbor_price = float(neighbor['price'])
+        neighbor_price = neighbor.price
 
         if side_code == 1 and neighbor_price >= ad_price and (neighbor_price - ad_price) <= gap:
             return True
@@ -112,22 +214,155 @@ def _find_neighbor_price(ad, all_ads, gap, side_code):
             return True
     return False
 
-def _find_price_in_list(list_to_search, all_ads, gap, side_code):
+class NeighborIndex:
+    """
+    Оголошення, відсортовані за ціною, для пошуку сусіда через bisect.
+
+    Сусід — оголошення іншого nickName з ціною в межах gap:
+    side_code 1 — [price, price + gap], side_code 0 — [price - gap, price].
+    next_other[k] — перший індекс після k з іншим nickName, тож перевірка
+    «чи є в діапазоні хтось, крім власника» — O(1). Разом O(log n) на запит.
+    """
+
+    _EPS = 1e-9
+
+    def __init__(self, all_ads):
+        pairs = sorted(((ad.price, ad.nick_name) for ad in all_ads), key=lambda p: p[0])
+        self.prices = [price for price, _ in pairs]
+        self.nicknames = [nickname for _, nickname in pairs]
+
+        n = len(pairs)
+        self.next_other = [n] * n
+        for k in range(n - 2, -1, -1):
+            if self.nicknames[k + 1] != self.nicknames[k]:
+                self.next_other[k] = k + 1
+            else:
+                self.next_other[k] = self.next_other[k + 1]
+
+    def has_neighbor(self, ad_price: float, owner, gap: float, side_code: int) -> bool:
+        prices = self.prices
+        # Межу з боку gap шукаємо з запасом EPS, а потім звужуємо тим самим
+        # виразом, що й лінійний пошук — результат збігається до біта
+        if side_code == 1:
+            lo = bisect_left(prices, ad_price)
+            hi = bisect_right(prices, ad_price + gap + self._EPS)
+            while hi > lo and not (prices[hi - 1] - ad_price <= gap):
+                hi -= 1
+        elif side_code == 0:
+            hi = bisect_right(prices, ad_price)
+            lo = bisect_left(prices, ad_price - gap - self._EPS)
+            while lo < hi and not (ad_price - prices[lo] <= gap):
+                lo += 1
+        else:
+            return False
+
+        if lo >= hi:
+            return False
+        return self.nicknames[lo] != owner or self.next_other[lo] < hi
+
+def _find_price_in_list(list_to_search, all_ads, gap, side_code, index: NeighborIndex | None = None):
+    if index is None:
+        index = NeighborIndex(all_ads)
     for ad in list_to_search:
-        if _find_neighbor_price(ad, all_ads, gap, side_code):
-            return float(ad['price'])
+        if index.has_neighbor(ad.price, ad.nick_name, gap, side_code):
+            return ad.price
     return None
 
-def find_price_from_config(ads_list: list, side_config: dict, side_code: int, price_gap: float, fallback_price: float) -> float:
-    filtered_ads = [ad for ad in ads_list if _is_ad_acceptable(ad, side_config)]
+def _side_name(side_code: int) -> str:
+    return 'BUY' if side_code == 0 else 'SELL'
+
+def _filter_ads(ads_list: list, side_config: dict, verdicts: dict | None, side_code: int) -> list:
+    side = _side_name(side_code)
+    profile = side_config.get("filter_stats", False)
+
+    if side_config.get("filter_mode") == "numpy":
+        import calc_price_np
+        if calc_price_np.is_available():
+            return calc_price_np.filter_ads_numpy(ads_list, side_config, side if profile else None)
+        logger.warning("⚠️ filter_mode: numpy, but numpy is not installed — using dict filtering")
+
+    compiled = compile_rules(side_config)
+    if side_config.get("check_remark_blacklist", False):
+        get_matcher(side_config.get('remark_blacklist', [])).fit(len(ads_list))
+    if side_config.get("filter_rule_order") == "adaptive":
+        compiled.reorder(lambda name: filter_stats.rank(side, name))
+
+    if profile:
+        counters = [[0, 0, 0.0] for _ in compiled.rules]
+        is_acceptable = lambda ad: compiled.profiled(ad, counters)
+    else:
+        is_acceptable = compiled
+
+    if verdicts is None:
+        filtered_ads = [ad for ad in ads_list if is_acceptable(ad)]
+    else:
+        # verdicts: ad id -> bool з минулих тіків (див. MarketState.verdicts)
+        filtered_ads = []
+        for ad in ads_list:
+            ad_id = ad.id
+            accepted = verdicts.get(ad_id) if ad_id is not None else None
+            if accepted is None:
+                accepted = is_acceptable(ad)
+                if ad_id is not None:
+                    verdicts[ad_id] = accepted
+            if accepted:
+                filtered_ads.append(ad)
+
+    if profile:
+        for (name, _), (checked, rejected, elapsed) in zip(compiled.rules, counters):
+            filter_stats.record(side, name, checked, rejected, elapsed)
+    return filtered_ads
+
+def find_price_from_config(ads_list: list, side_config: dict, side_code: int, price_gap: float, fallback_price: float,
+                           verdicts: dict | None = None) -> float:
+    """ads_list — MarketAd (з fetch_market_ads) або сирі dict-и ринку"""
+    ads_list = as_market_ads(ads_list)
+    filtered_ads = _filter_ads(ads_list, side_config, verdicts, side_code)
+    return _select_price(filtered_ads, len(ads_list), side_config, side_code, price_gap, fallback_price)
+
+def payment_independent_config(side_config: dict) -> dict:
+    """Конфіг без правила способів оплати — спільна база для всіх наборів оплат"""
+    return {**side_config, "check_payment_methods": False}
+
+def find_prices_by_payment_sets(ads_list: list, side_config: dict, payment_sets, side_code: int, price_gap: float,
+                                fallback_price: float, verdicts: dict | None = None) -> dict:
+    """
+    Ціни для кількох наборів способів оплати за один прохід по ринку.
+
+    Правила, що не залежать від оплати, рахуються один раз (verdicts — для
+    payment_independent_config), далі для кожного унікального набору
+    лише правило Payment Methods по вже відфільтрованій базі.
+    payment_sets — кортежі paymentType (з повторами, як у paymentTerms).
+    Повертає {набір: ціна}; ціни ті самі, що дав би find_price_from_config
+    з allowed_payment_types = набір.
+    """
+    ads_list = as_market_ads(ads_list)
+    base_ads = _filter_ads(ads_list, payment_independent_config(side_config), verdicts, side_code)
+    check_payments = side_config.get("check_payment_methods", False)
+    profile = side_config.get("filter_stats", False)
+
+    prices = {}
+    for payment_set in dict.fromkeys(payment_sets):
+        set_config = {**side_config, "allowed_payment_types": list(payment_set)}
+        if check_payments:
+            accepts = _rule_payment_methods(set_config)
+            started = time.perf_counter()
+            filtered_ads = [ad for ad in base_ads if accepts(ad)]
+            if profile:
+                filter_stats.record(_side_name(side_code), 'Payment Methods', len(base_ads),
+                                    len(base_ads) - len(filtered_ads), time.perf_counter() - started)
+        else:
+            filtered_ads = base_ads
+        logger.info(f"💳 Payment set {list(payment_set)}:")
+        prices[payment_set] = _select_price(filtered_ads, len(ads_list), set_config, side_code, price_gap, fallback_price)
+    return prices
 
-    logger.info(f"🧾 Filtered ads ({'BUY' if side_code == 0 else 'SELL'}):")
-    logger.info(f"✅ {len(filtered_ads)} ads passed filtering out of {len(ads_list)} total")
+def _select_price(filtered_ads: list, total: int, side_config: dict, side_code: int, price_gap: float,
+                  fallback_price: float) -> float:
+    logger.info(f"🧾 Filtered ads ({_side_name(side_code)}):")
+    logger.info(f"✅ {len(filtered_ads)} ads passed filtering out of {total} total")
     for ad in filtered_ads:
-        nickname = ad.get("nickName", "?")
-        price = ad.get("price", "?")
-        qty = ad.get("lastQuantity", "?")
-        logger.info(f"  - {nickname} | price: {price} | qty: {qty}")
+        logger.info(f"  - {ad.nick_name} | price: {ad.price} | qty: {ad.last_quantity}")
 
     if not filtered_ads:
       logger.warning("⚠️ No ads passed filtering, using fallback price")
@@ -138,27 +373,28 @@ def find_price_from_config(ads_list: list, side_config: dict, side_code: int, pr
 
     if use_target:
         target_nicknames = side_config.get("target_nicknames", [])
-        target_ads = [ad for ad in filtered_ads if ad['nickName'] in target_nicknames]
-        other_ads = [ad for ad in filtered_ads if ad['nickName'] not in target_nicknames]
+        target_ads = [ad for ad in filtered_ads if ad.nick_name in target_nicknames]
+        other_ads = [ad for ad in filtered_ads if ad.nick_name not in target_nicknames]
 
         if use_neighbors:
-            price = _find_price_in_list(target_ads, filtered_ads, price_gap, side_code)
+            index = NeighborIndex(filtered_ads)
+            price = _find_price_in_list(target_ads, filtered_ads, price_gap, side_code, index)
             if price is not None:
                 return price
-            price = _find_price_in_list(other_ads, filtered_ads, price_gap, side_code)
+            price = _find_price_in_list(other_ads, filtered_ads, price_gap, side_code, index)
             if price is not None:
                 return price
         else:
             if target_ads:
-                return float(target_ads[0]['price'])
+                return target_ads[0].price
             if other_ads:
-                return float(other_ads[0]['price'])
+                return other_ads[0].price
     else:
         if use_neighbors:
             price = _find_price_in_list(filtered_ads, filtered_ads, price_gap, side_code)
             if price is not None:
                 return price
         else:
-            return float(filtered_ads[0]['price'])
+            return filtered_ads[0].price
 
     return fallback_price
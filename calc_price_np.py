@@ -0,0 +1,198 @@
+# calc_price_np.py
+#
+# Колонковий (NumPy) режим фільтрації для find_price_from_config.
+# Список оголошень один раз перетворюється на масиви, а кожне правило
+# з calc_price.ALL_RULES рахується як векторна булева маска.
+# Вмикається в конфігу сторони: filter_mode: numpy
+
+import logging
+import time
+
+try:
+    import numpy as np
+except ImportError:  # numpy опційний — без нього працює звичайний dict-режим
+    np = None
+
+from calc_price import filter_stats, to_float
+from payment_index import payment_registry
+from remark_filter import get_matcher
+
+logger = logging.getLogger(__name__)
+
+_M1 = 0x5555555555555555
+_M2 = 0x3333333333333333
+_M4 = 0x0F0F0F0F0F0F0F0F
+_H01 = 0x0101010101010101
+
+def _popcount64(x):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    x = x - ((x >> np.uint64(1)) & np.uint64(_M1))
+    x = (x & np.uint64(_M2)) + ((x >> np.uint64(2)) & np.uint64(_M2))
+    x = (x + (x >> np.uint64(4))) & np.uint64(_M4)
+    return (x * np.uint64(_H01)) >> np.uint64(56)
+
+class MarketColumns:
+    """Колонки ринку, потрібні правилам фільтра (будуються один раз на список MarketAd)"""
+
+    def __init__(self, ads_list: list):
+        n = len(ads_list)
+
+        def column(attr, dtype=np.float64):
+            return np.fromiter((getattr(ad, attr) for ad in ads_list), dtype=dtype, count=n)
+
+        self.ads = ads_list
+        self.price = column('price')
+        self.last_quantity = column('last_quantity')
+        self.min_amount = column('min_amount')
+        self.max_amount = column('max_amount')
+        self.recent_order_num = column('recent_order_num')
+        self.register_time = column('register_time')
+        self.order_finish_30 = column('order_finish_30')
+        self.has_register_time = column('has_register_time', bool)
+        self.has_order_finish = column('has_order_finish', bool)
+        self.has_national_limit = column('has_national_limit', bool)
+        self.national_limits = [ad.national_limit for ad in ads_list]
+        self.nicknames = np.array([ad.nick_name for ad in ads_list], dtype=object)
+        self.remarks = [ad.remark for ad in ads_list]
+        self.ids = [ad.id for ad in ads_list]
+
+        # Бітова маска способів оплати з payment_index (біти спільного
+        # реєстру), по 64 біти на слово (колонку uint64)
+        masks = [ad.payment_mask for ad in ads_list]
+        words = max(1, (len(payment_registry) + 63) // 64)
+        self.payment_mask = np.zeros((n, words), dtype=np.uint64)
+        for w in range(words):
+            shift = 64 * w
+            self.payment_mask[:, w] = np.fromiter(
+                ((mask >> shift) & 0xFFFFFFFFFFFFFFFF for mask in masks), dtype=np.uint64, count=n
+            )
+
+    def payment_matches(self, allowed) -> "np.ndarray":
+        words = self.payment_mask.shape[1]
+        # Типи, що з'явились у реєстрі вже після побудови колонок, у цих
+        # оголошеннях бути не можуть — відрізаємо їх разом зі старшими словами
+        query_mask = payment_registry.query(allowed)
+        query = np.fromiter(
+            ((query_mask >> (64 * w)) & 0xFFFFFFFFFFFFFFFF for w in range(words)), dtype=np.uint64, count=words
+        )
+        return _popcount64(self.payment_mask & query).sum(axis=1)
+
+def _mask_min_total_orders(cols, cfg):
+    return cols.recent_order_num > to_float(cfg.get('min_total_orders', 0))
+
+def _mask_payment_methods(cols, cfg):
+    allowed_list = cfg.get('allowed_payment_types', [])
+    required = min(to_float(cfg.get('min_payment_matches', 1)), len(allowed_list))
+    return cols.payment_matches(frozenset(allowed_list)) >= required
+
+def _mask_min_balance(cols, cfg):
+    return cols.last_quantity >= to_float(cfg.get('min_amount_threshold', 0))
+
+def _mask_min_limit(cols, cfg):
+    return cols.min_amount <= to_float(cfg.get('min_limit_threshold', float('inf')))
+
+def _mask_limit_range(cols, cfg):
+    return (cols.max_amount - cols.min_amount) >= to_float(cfg.get('min_limit_range', 0))
+
+def _mask_register_time(cols, cfg):
+    threshold = to_float(cfg.get('min_register_days', float('inf')))
+    return ~cols.has_register_time | (cols.register_time <= threshold)
+
+def _mask_order_count(cols, cfg):
+    threshold = to_float(cfg.get('min_order_count', float('inf')))
+    return ~cols.has_order_finish | (cols.order_finish_30 <= threshold)
+
+def _mask_country_whitelist(cols, cfg, rows):
+    whitelist = frozenset(cfg.get('country_whitelist', []))
+    return np.fromiter(
+        (not cols.has_national_limit[i] or not whitelist.isdisjoint(cols.national_limits[i]) for i in rows),
+        dtype=bool,
+        count=len(rows),
+    )
+
+def _mask_remark_blacklist(cols, cfg, rows):
+    # Підрядки не векторизуються в numpy — один прохід скомпільованим
+    # матчером по заздалегідь lower() ремарках, з кешем вердиктів
+    matcher = get_matcher(cfg.get('remark_blacklist', []))
+    matcher.fit(len(cols.ads))
+    return np.fromiter(
+        (matcher.is_clean(cols.ids[i], cols.remarks[i]) for i in rows),
+        dtype=bool,
+        count=len(rows),
+    )
+
+def _mask_exclude_nicknames(cols, cfg):
+    return ~np.isin(cols.nicknames, list(cfg.get('exclude_nicknames', [])))
+
+def _mask_sell_vs_buy_gap(cols, cfg):
+    if cfg.get('side') != 'SELL':
+        return None
+    min_price = to_float(cfg.get("reference_buy_price", 0)) * (1 + to_float(cfg.get("min_gap_percent", 0.015)))
+    return cols.price >= min_price
+
+# Ті самі правила й прапорці, що в calc_price.ALL_RULES
+ALL_MASKS = [
+    ('Minimum Total Orders', 'check_orderNum', _mask_min_total_orders),
+    ('Payment Methods', 'check_payment_methods', _mask_payment_methods),
+    ('Minimum Balance', 'check_min_balance', _mask_min_balance),
+    ('Minimum Limit', 'check_min_limit', _mask_min_limit),
+    ('Limit Range', 'check_limit_range', _mask_limit_range),
+    ('Advertiser Register Time', 'check_register_days', _mask_register_time),
+    ('Advertiser Order Count', 'check_min_orders', _mask_order_count),
+    ('Country Whitelist', 'check_country_whitelist', _mask_country_whitelist),
+    ('Remark Blacklist', 'check_remark_blacklist', _mask_remark_blacklist),
+    ('Nickname Blacklist', 'check_exclude_nicknames', _mask_exclude_nicknames),
+    ('Min Price Delta from BUY (SELL only)', 'check_sell_vs_buy_gap', _mask_sell_vs_buy_gap),
+]
+
+# Правила з Python-циклом по рядках: (cols, cfg, rows) -> маска для rows.
+# Рахуються після векторних і лише по оголошеннях, що їх пройшли
+ROW_MASKS = {_mask_country_whitelist, _mask_remark_blacklist}
+
+# Колонки останніх списків ринку: у межах тіку той самий market_ads
+# фільтрується для кожного #p оголошення
+_COLUMNS_CACHE_SIZE = 4
+_columns_cache: list = []
+
+def get_columns(ads_list: list) -> MarketColumns:
+    for cols in _columns_cache:
+        if cols.ads is ads_list and len(cols.price) == len(ads_list):
+            return cols
+    cols = MarketColumns(ads_list)
+    _columns_cache.insert(0, cols)
+    del _columns_cache[_COLUMNS_CACHE_SIZE:]
+    return cols
+
+def is_available() -> bool:
+    return np is not None
+
+def filter_ads_numpy(ads_list: list, cfg: dict, stats_side: str | None = None) -> list:
+    """
+    Повертає ті самі оголошення (і в тому ж порядку), що й dict-режим.
+    stats_side — писати лічильники правил у calc_price.filter_stats;
+    rejected тут — скільки оголошень маска правила відсіяла додатково.
+    """
+    if not ads_list:
+        return []
+
+    cols = get_columns(ads_list)
+    mask = np.ones(len(ads_list), dtype=bool)
+    active = [(name, rule_mask) for name, flag, rule_mask in ALL_MASKS if cfg.get(flag, False)]
+    # Спершу векторні маски, потім рядкові — лише по тих, хто вижив
+    active.sort(key=lambda item: item[1] in ROW_MASKS)
+    for name, rule_mask in active:
+        started = time.perf_counter()
+        checked = int(mask.sum()) if stats_side is not None else 0
+        if rule_mask in ROW_MASKS:
+            rows = np.flatnonzero(mask)
+            mask[rows] = rule_mask(cols, cfg, rows)
+        else:
+            rule = rule_mask(cols, cfg)
+            if rule is None:
+                continue
+            mask &= rule
+        if stats_side is not None:
+            filter_stats.record(stats_side, name, checked, checked - int(mask.sum()), time.perf_counter() - started)
+
+    return [ads_list[i] for i in np.flatnonzero(mask)]
@@ -1,103 +1,164 @@
 import asyncio
 import logging
-from pprint import pprint
-from ads import fetch_market_ads, get_my_ads, has_flag, update_ad_dynamic
-from api_client import get_api
-from calc_price import find_price_from_config, to_float
+import time
+import traceback
+import runtime_stats
+from ads import fetch_market_ads, get_my_ads, has_flag
+from api_client import get_async_api
+from calc_price import filter_stats
+from order_cache import get_order_cache
 from orders_log import process_active_orders
 from telegram_bot import run_bot, running_flags, config_state as config
 from calc_balance import get_BUY_balance, get_SELL_balance
+from market_state import MarketState
+from pricing import apply_ad_prices, calculate_ad_prices, last_flagged_price
+from scheduler import TickScheduler
 
 # Глобальні константи
-api = get_api(config)
+api = get_async_api(config)
 TOKEN = config["p2p"]["token"]
 TOTAL = float(config["p2p"]["total"])
+scheduler = TickScheduler.from_config(config)
+market_state = MarketState()
 
-def process_ads_with_flags(ads, side, market_ads, quantity, side_config, price_offset):
-    """Обробляє оголошення з флагами #p та #q"""
-    last_price = None
-    
-    for ad in ads:
-        if not has_flag(ad, "#p") and not has_flag(ad, "#q"):
-            continue
-            
-        price = None
-        if has_flag(ad, "#p"):
-            price = calculate_ad_price(ad, side, market_ads, side_config, price_offset)
-            last_price = price
-            
-        quantity_to_update = quantity if has_flag(ad, "#q") else None
-        update_ad_dynamic(api, ad, price=price, quantity=quantity_to_update)
-    
-    return last_price
-
-def calculate_ad_price(ad, side, market_ads, side_config, price_offset):
-    """Розраховує ціну для оголошення"""
-    payments = [term["paymentType"] for term in ad.get("paymentTerms", [])]
-    pprint(f"[{side}] Payments for ad {ad['id']}: {payments}")
-
-    custom_config = side_config.copy()
-    custom_config["allowed_payment_types"] = [str(p) for p in payments]
-
-    price = find_price_from_config(
-        ads_list=market_ads,
-        side_config=custom_config, 
-        side_code=config["p2p"]["side_codes"][side],
-        price_gap=to_float(config["pricing"]["price_gap"]),
-        fallback_price=custom_config["fallback_price"]
-    )
-    return round(price + price_offset, 2)
-
-def process_side(side, is_buy=False):
-    # Отримуємо дані
-    market_ads = fetch_market_ads(api, side, config)
-    my_ads = get_my_ads(api, config, side)
-    
-    # Розраховуємо кількість
+async def process_side(side, is_buy=False, buy_price=None):
+    """
+    Один тік репрайсингу для сторони (ордери — окремо, в order_loop).
+    Всі виклики API — через AsyncP2P,
+    тож BUY і SELL можуть працювати паралельно.
+    BUY публікує свою ціну у buy_price одразу після розрахунку, ще до update_ad,
+    тож SELL рахує й пише паралельно з записами BUY (reference_buy_price).
+    """
     if is_buy:
-        quantity = get_BUY_balance(api, TOKEN, TOTAL)
+        balance_call = get_BUY_balance(api, TOKEN, TOTAL)
         price_offset = 0.01
     else:
-        quantity = get_SELL_balance(api, TOKEN)  
+        balance_call = get_SELL_balance(api, TOKEN)
         price_offset = -0.01
-    
-    # Обробляємо оголошення
-    last_price = process_ads_with_flags(
-        my_ads, side, market_ads, quantity, config[side], price_offset
-    )
-    
-    # Обробляємо активні ордери
-    process_active_orders(api, config, side)
-    
+
+    try:
+        # Отримуємо дані
+        market_ads, my_ads, quantity = await asyncio.gather(
+            fetch_market_ads(api, side, config),
+            get_my_ads(api, config, side),
+            balance_call,
+        )
+        scheduler.observe_book(side, market_ads)
+        market_state.update(side, market_ads)
+        filter_stats.start_tick(side)
+
+        side_config = config[side]
+        if not is_buy and buy_price is not None:
+            # SELL reference береться з BUY цього ж тіку, config не змінюємо
+            side_config = {**side_config, "reference_buy_price": await buy_price}
+
+        # Рахуємо ціни #p оголошень
+        prices = calculate_ad_prices(
+            config, [ad for ad in my_ads if has_flag(ad, "#p")], side, market_ads, side_config, price_offset,
+            market_state
+        )
+        filter_stats.log_tick(side)
+        last_price = last_flagged_price(my_ads, prices)
+    except Exception as e:
+        if is_buy and buy_price is not None and not buy_price.done():
+            buy_price.set_exception(e)
+        raise
+
+    if is_buy and buy_price is not None:
+        buy_price.set_result(last_price or 0)
+
+    # Оновлюємо оголошення
+    await apply_ad_prices(api, my_ads, prices, quantity)
     return last_price
 
+async def run_tick():
+    """BUY і SELL як паралельні задачі; BUY-ціна передається через future"""
+    buy_price = asyncio.get_running_loop().create_future()
+    started = time.monotonic()
+
+    results = await asyncio.gather(
+        process_side("BUY", is_buy=True, buy_price=buy_price),
+        process_side("SELL", is_buy=False, buy_price=buy_price),
+        return_exceptions=True,
+    )
+
+    for side, result in zip(("BUY", "SELL"), results):
+        if isinstance(result, Exception):
+            traceback.print_exception(result)
+            print(f"[!] Error in {side} tick: {result}")
+
+    logging.info(f"⏱ Tick finished in {time.monotonic() - started:.2f}s")
+
 async def main_loop():
-    """Основний цикл програми"""
+    """Цикл репрайсингу оголошень"""
     while True:
         if not running_flags["main_loop"]:
             await asyncio.sleep(1)
             continue
 
         try:
-            # BUY операції
-            last_buy_price = process_side("BUY", is_buy=True)
-            
-            # Передаємо BUY-ціну для SELL reference
-            config["SELL"]["reference_buy_price"] = last_buy_price or 0
-            
-            # SELL операції
-            process_side("SELL", is_buy=False)
-            
+            await run_tick()
         except Exception as e:
-            import traceback
             traceback.print_exc()
             print(f"[!] Error in main loop: {e}")
 
-        await asyncio.sleep(30)
+        await asyncio.sleep(scheduler.next_interval())
+
+async def process_orders_tick():
+    """Ордери BUY і SELL паралельно; помилка однієї сторони не зупиняє іншу"""
+    started = time.monotonic()
+    results = await asyncio.gather(
+        process_active_orders(api, config, "BUY"),
+        process_active_orders(api, config, "SELL"),
+        return_exceptions=True,
+    )
+
+    counts = []
+    for side, result in zip(("BUY", "SELL"), results):
+        if isinstance(result, Exception):
+            traceback.print_exception(result)
+            print(f"[!] Error in {side} orders: {result}")
+            counts.append(f"{side}=error")
+        else:
+            scheduler.observe_orders(side, result)
+            counts.append(f"{side}={result}")
+
+    # Лічильники кешу деталей — наростаючим підсумком від старту
+    cache = get_order_cache(config).stats
+    logging.info(
+        f"📦 Orders tick finished in {time.monotonic() - started:.2f}s ({' '.join(counts)}); "
+        f"details cache total: hits={cache['hits']} misses={cache['misses']} "
+        f"invalidations={cache['invalidations']} evictions={cache['evictions']}"
+    )
+
+async def order_loop():
+    """
+    Окремий швидкий цикл для ордерів: реквізити та mark_as_paid
+    не чекають на скан ринку й оновлення оголошень.
+    API-клієнт (і його ліміти) спільний з main_loop.
+    Раз на stats.log_interval пише в лог лічильники всіх компонентів.
+    """
+    while True:
+        runtime_stats.maybe_log(float(config.get("stats", {}).get("log_interval", 300)))
+
+        if not running_flags["main_loop"]:
+            await asyncio.sleep(1)
+            continue
+
+        try:
+            await process_orders_tick()
+        except Exception as e:
+            traceback.print_exc()
+            print(f"[!] Error in order loop: {e}")
+
+        await asyncio.sleep(float(config.get("orders", {}).get("interval", 3)))
 
 async def main():
-    """Запуск програми"""
-    await asyncio.gather(main_loop(), run_bot())
+    """Запуск програми; API-клієнт (сесія aiohttp / пул потоків) закривається при виході"""
+    try:
+        await asyncio.gather(main_loop(), order_loop(), run_bot())
+    finally:
+        await api.close()
 
 if __name__ == "__main__":
     logging.basicConfig(
@@ -0,0 +1,96 @@
+import logging
+from typing import Dict, List
+
+from payment_index import payment_mask
+
+logger = logging.getLogger(__name__)
+
+def _to_float(value) -> float:
+    # Як calc_price.to_float: None, '' і сміття -> 0.0
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return 0.0
+
+class MarketAd:
+    """
+    Оголошення ринку в тому вигляді, в якому його читають фільтр і пошук ціни:
+    лише потрібні поля, числа вже float, списки — tuple, payments — бітова
+    маска з payment_index, remark уже в нижньому регістрі.
+
+    Парситься один раз на знімок (parse_snapshot) — правила більше не
+    викликають to_float і не ходять по вкладеному tradingPreferenceSet.
+    Рівність — за всіма полями: так MarketState бачить зміни лише в тому,
+    від чого залежить фільтр.
+    """
+
+    __slots__ = (
+        "id",
+        "nick_name",
+        "price",
+        "last_quantity",
+        "min_amount",
+        "max_amount",
+        "recent_order_num",
+        "payments",
+        "payment_mask",
+        "remark",
+        "has_register_time",
+        "register_time",
+        "has_order_finish",
+        "order_finish_30",
+        "has_national_limit",
+        "national_limit",
+    )
+
+    def __init__(self, ad: Dict):
+        pref = ad.get("tradingPreferenceSet", {})
+        self.id = ad.get("id")
+        self.nick_name = ad.get("nickName")
+        self.price = _to_float(ad.get("price", 0))
+        self.last_quantity = _to_float(ad.get("lastQuantity"))
+        self.min_amount = _to_float(ad.get("minAmount"))
+        self.max_amount = _to_float(ad.get("maxAmount"))
+        self.recent_order_num = _to_float(ad.get("recentOrderNum", 0))
+        self.payments = tuple(ad.get("payments", []))
+        self.payment_mask = payment_mask(ad)
+        self.remark = ad.get("remark", "").lower()
+        self.has_register_time = pref.get("hasRegisterTime") == 1
+        self.register_time = _to_float(pref.get("registerTimeThreshold"))
+        self.has_order_finish = pref.get("hasOrderFinishNumberDay30") == 1
+        self.order_finish_30 = _to_float(pref.get("orderFinishNumberDay30"))
+        self.has_national_limit = pref.get("hasNationalLimit") == 1
+        self.national_limit = tuple(pref.get("nationalLimit", []))
+
+    def _fields(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, MarketAd):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"MarketAd({self.nick_name!r}, {self.price}, id={self.id!r})"
+
+# Розібрані версії останніх знімків: MarketCache віддає той самий список,
+# поки він свіжий, тож парсимо його один раз, а не на кожен тік
+_PARSED_CACHE_SIZE = 4
+_parsed_cache: list = []
+
+def parse_snapshot(ads: List[Dict]) -> List[MarketAd]:
+    for raw, parsed in _parsed_cache:
+        if raw is ads and len(parsed) == len(ads):
+            return parsed
+    parsed = [MarketAd(ad) for ad in ads]
+    _parsed_cache.insert(0, (ads, parsed))
+    del _parsed_cache[_PARSED_CACHE_SIZE:]
+    return parsed
+
+def as_market_ads(ads: List) -> List[MarketAd]:
+    """Список MarketAd як є; сирі dict-и (фікстури, інструменти) — розбираються"""
+    if not ads or isinstance(ads[0], MarketAd):
+        return ads
+    return parse_snapshot(ads)
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+import runtime_stats
+
+logger = logging.getLogger(__name__)
+
+MarketKey = Tuple[str, str, str, int]  # (token, currency, side_code, max_pages)
+
+class MarketCache:
+    """
+    Спільний TTL-кеш знімків ринку (get_online_ads) за ключем
+    (token, currency, side, max_pages): глибина знімку — теж частина ключа.
+
+    - молодший за ttl — віддається як є;
+    - старший за ttl, але в межах stale_ttl — віддається одразу,
+      а у фоні запускається оновлення (stale-while-revalidate);
+    - інакше — чекаємо на оновлення.
+    allow_stale=False (репрайсинг) — старший за ttl знімок не віддається,
+    чекаємо на свіжий; stale-while-revalidate лише для ad-hoc споживачів.
+    Для одного ключа одночасно йде не більше одного оновлення: всі, хто
+    прийшов під час нього, чекають той самий запит.
+
+    Знімок спільний для всіх споживачів — списки та оголошення не мутувати.
+    """
+
+    def __init__(self, ttl: float = 4.0, stale_ttl: float = 10.0):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._snapshots: Dict[MarketKey, Tuple[List[Dict], float]] = {}
+        self._refreshing: Dict[MarketKey, asyncio.Task] = {}
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "refreshes": 0, "errors": 0}
+
+    async def get(self, key: MarketKey, loader: Callable[[], Awaitable[List[Dict]]],
+                  allow_stale: bool = True) -> List[Dict]:
+        entry = self._snapshots.get(key)
+        if entry is not None:
+            ads, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl:
+                self.stats["hits"] += 1
+                return ads
+            if allow_stale and age < self.ttl + self.stale_ttl:
+                self.stats["stale"] += 1
+                self._refresh(key, loader)
+                return ads
+
+        self.stats["misses"] += 1
+        # shield: скасування одного споживача не скасовує спільне оновлення
+        return await asyncio.shield(self._refresh(key, loader))
+
+    def invalidate(self, key: MarketKey | None = None):
+        if key is None:
+            self._snapshots.clear()
+        else:
+            self._snapshots.pop(key, None)
+
+    def _refresh(self, key: MarketKey, loader) -> asyncio.Task:
+        task = self._refreshing.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, loader))
+            task.add_done_callback(self._log_failure)
+            self._refreshing[key] = task
+        return task
+
+    async def _load(self, key: MarketKey, loader) -> List[Dict]:
+        try:
+            started = time.perf_counter()
+            ads = await loader()
+            self._snapshots[key] = (ads, time.monotonic())
+            self.stats["refreshes"] += 1
+            logger.info(f"📸 Market snapshot {key}: {len(ads)} ads in {time.perf_counter() - started:.2f}s")
+            return ads
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            self._refreshing.pop(key, None)
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Market snapshot refresh failed: {task.exception()}")
+
+_cache: MarketCache | None = None
+
+def get_market_cache(config: Dict) -> MarketCache:
+    """Один кеш на процес; ttl/stale_ttl беруться з секції market_cache"""
+    global _cache
+    if _cache is None:
+        cfg = config.get("market_cache", {})
+        _cache = MarketCache(
+            ttl=float(cfg.get("ttl", 4)),
+            stale_ttl=float(cfg.get("stale_ttl", 10)),
+        )
+        runtime_stats.register("market_cache", _cache.stats)
+    return _cache
@@ -0,0 +1,85 @@
+import json
+import logging
+from collections import OrderedDict
+from typing import Dict, List
+
+from market_ad import MarketAd
+
+logger = logging.getLogger(__name__)
+
+MAX_VERDICT_SETS = 32  # скільки різних конфігів фільтра пам'ятаємо на сторону
+
+class MarketDiff:
+    __slots__ = ("added", "removed", "changed", "unchanged")
+
+    def __init__(self, added: List[MarketAd], removed: List[MarketAd], changed: List[MarketAd], unchanged: int):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+        self.unchanged = unchanged
+
+    def sizes(self) -> Dict[str, int]:
+        return {
+            "added": len(self.added),
+            "removed": len(self.removed),
+            "changed": len(self.changed),
+            "unchanged": self.unchanged,
+        }
+
+class MarketState:
+    """
+    Пам'ятає попередній знімок ринку кожної сторони (індекс за ad id)
+    і рахує diff з новим: added / removed / changed.
+    MarketAd містить лише поля, від яких залежать фільтри та ціна, тож
+    рівні MarketAd — незмінне оголошення, і минулий вердикт фільтра валідний.
+
+    Також тримає вердикти фільтра (ad id -> bool) для кожного конфігу.
+    На update вердикти змінених і зниклих оголошень скидаються, тож
+    find_price_from_config перевіряє правила лише для того, що змінилось.
+    """
+
+    def __init__(self):
+        self._snapshots: Dict[str, Dict[str, MarketAd]] = {}
+        self._verdicts: Dict[str, OrderedDict] = {}
+        self.last_diff_sizes: Dict[str, Dict[str, int]] = {}
+
+    def update(self, side: str, ads: List[MarketAd]) -> MarketDiff:
+        previous = self._snapshots.get(side, {})
+        current = {ad.id: ad for ad in ads if ad.id is not None}
+
+        added, changed = [], []
+        unchanged = 0
+        for ad_id, ad in current.items():
+            old = previous.get(ad_id)
+            if old is None:
+                added.append(ad)
+            elif old is ad or old == ad:
+                unchanged += 1
+            else:
+                changed.append(ad)
+        removed = [ad for ad_id, ad in previous.items() if ad_id not in current]
+
+        stale_ids = [ad.id for ad in changed] + [ad.id for ad in removed]
+        for verdicts in self._verdicts.get(side, {}).values():
+            for ad_id in stale_ids:
+                verdicts.pop(ad_id, None)
+
+        self._snapshots[side] = current
+        diff = MarketDiff(added, removed, changed, unchanged)
+        self.last_diff_sizes[side] = diff.sizes()
+        logger.info(
+            f"🔀 [{side}] Market diff: +{len(added)} -{len(removed)} ~{len(changed)} ={unchanged}"
+        )
+        return diff
+
+    def verdicts(self, side: str, side_config: Dict) -> Dict[str, bool]:
+        """Пам'ять вердиктів фільтра для конкретного конфігу сторони"""
+        key = json.dumps(side_config, sort_keys=True, default=str)
+        per_side = self._verdicts.setdefault(side, OrderedDict())
+        if key in per_side:
+            per_side.move_to_end(key)
+        else:
+            per_side[key] = {}
+            if len(per_side) > MAX_VERDICT_SETS:
+                per_side.popitem(last=False)
+        return per_side[key]
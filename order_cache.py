@@ -0,0 +1,62 @@
+import logging
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+import runtime_stats
+
+logger = logging.getLogger(__name__)
+
+class OrderDetailsCache:
+    """
+    Кеш get_order_details за order id.
+
+    Версія ордера — (status, updateDate) з pending-списку: поки вона та сама,
+    деталі беруться з кешу; змінилась — запис інвалідується й деталі
+    запитуються заново. Понад max_size записів витісняється найдавніше
+    використаний (LRU).
+    """
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self._items: "OrderedDict[str, Tuple[tuple, Dict]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+    @staticmethod
+    def version(order: Dict) -> tuple:
+        return order.get("status"), order.get("updateDate")
+
+    async def get(self, api, order: Dict) -> Dict:
+        """Деталі ордера з pending-списку (поле result відповіді get_order_details)"""
+        order_id = str(order["id"])
+        version = self.version(order)
+
+        cached = self._items.get(order_id)
+        if cached is not None:
+            if cached[0] == version:
+                self.stats["hits"] += 1
+                self._items.move_to_end(order_id)
+                return cached[1]
+            self.stats["invalidations"] += 1
+            logger.info(f"[ORDER_CACHE] Order {order_id} changed {cached[0]} -> {version}, refetching details")
+
+        self.stats["misses"] += 1
+        details = (await api.get_order_details(orderId=order["id"]))["result"]
+        self._items[order_id] = (version, details)
+        self._items.move_to_end(order_id)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+            self.stats["evictions"] += 1
+        return details
+
+    def invalidate(self, order_id):
+        self._items.pop(str(order_id), None)
+
+_cache: OrderDetailsCache | None = None
+
+def get_order_cache(config: Dict) -> OrderDetailsCache:
+    """Один кеш на процес; розмір — orders.details_cache_size"""
+    global _cache
+    if _cache is None:
+        _cache = OrderDetailsCache(int(config.get("orders", {}).get("details_cache_size", 256)))
+        runtime_stats.register("order_cache", _cache.stats)
+    return _cache
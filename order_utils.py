@@ -36,12 +36,12 @@ def extract_polish_phone(text: str) -> Optional[str]:
         return digits[2:]
     return None
 
-def get_my_payment_method_with_hash(api) -> Optional[Dict]:
+async def get_my_payment_method_with_hash(api) -> Optional[Dict]:
     """
     Отримує мій спосіб оплати з branchName що починається з '###'
     """
     try:
-        response = api.get_user_payment_types()
+        response = await api.get_user_payment_types()
         my_payment_methods = response.get("result", [])
         
         for method in my_payment_methods:
@@ -57,7 +57,7 @@ def get_my_payment_method_with_hash(api) -> Optional[Dict]:
         logging.error(f"[MY_PAYMENT] Failed to get user payment types: {e}")
         return None
 
-def extract_payment_info(api, order: dict, direction: str, token_name: str = "USDT", currency: str = "") -> dict:
+async def extract_payment_info(api, order: dict, direction: str, token_name: str = "USDT", currency: str = "") -> dict:
     """
     Витягує дані про оплату:
     - SELL + PLN: використовує мої власні дані (з branchName що починається з ###)
@@ -69,7 +69,7 @@ def extract_payment_info(api, order: dict, direction: str, token_name: str = "US
     # Для SELL в PLN використовуємо мої власні дані
     if direction == "SELL" and currency == "PLN":
         logging.info(f"[PAYMENT_INFO] SELL PLN detected, using my payment method")
-        my_payment = get_my_payment_method_with_hash(api)
+        my_payment = await get_my_payment_method_with_hash(api)
         
         if my_payment:
             # Витягуємо дані з мого способу оплати
@@ -182,7 +182,7 @@ def extract_payment_info(api, order: dict, direction: str, token_name: str = "US
     
     return payment_info
 
-def send_payment_info_to_chat(api, order_id, info: dict):
+async def send_payment_info_to_chat(api, order_id, info: dict):
     if not order_id:
         logging.warning("[CHAT] No order_id in info")
         return
@@ -192,7 +192,7 @@ def send_payment_info_to_chat(api, order_id, info: dict):
     # 1. Відправляємо назву банку
     bank_name = info.get("bank", "Not Found")
     try:
-        api.send_chat_message(
+        await api.send_chat_message(
             message=bank_name,
             contentType="str",
             orderId=order_id,
@@ -205,7 +205,7 @@ def send_payment_info_to_chat(api, order_id, info: dict):
     # 2. Відправляємо назву отримувача
     full_name = info.get("full_name", "Not Found")
     try:
-        api.send_chat_message(
+        await api.send_chat_message(
             message=full_name,
             contentType="str",
             orderId=order_id,
@@ -221,7 +221,7 @@ def send_payment_info_to_chat(api, order_id, info: dict):
         iban_list = [iban.strip() for iban in ibans.split(",")]
         for i, iban in enumerate(iban_list):
             try:
-                api.send_chat_message(
+                await api.send_chat_message(
                     message=iban,
                     contentType="str",
                     orderId=order_id,
@@ -237,7 +237,7 @@ def send_payment_info_to_chat(api, order_id, info: dict):
         phone_list = [p.strip() for p in phones.split(",")]
         for i, phone in enumerate(phone_list):
             try:
-                api.send_chat_message(
+                await api.send_chat_message(
                     message=phone,
                     contentType="str",
                     orderId=order_id,
@@ -250,7 +250,7 @@ def send_payment_info_to_chat(api, order_id, info: dict):
     # 5. Відправляємо титул (order_id)
     order_title = info.get("order_id", "Not Found")
     try:
-        api.send_chat_message(
+        await api.send_chat_message(
             message=order_title,
             contentType="str",
             orderId=order_id,
@@ -260,7 +260,7 @@ def send_payment_info_to_chat(api, order_id, info: dict):
     except Exception as e:
         logging.exception(f"[CHAT] Failed to send order_id: {e}")
 
-def send_payment_block_to_chat(api, order_id: str, info: dict, country_code: str = "EN", token_name: str = "USDT"):
+async def send_payment_block_to_chat(api, order_id: str, info: dict, country_code: str = "EN", token_name: str = "USDT"):
     """Send the full payment info as a single block message based on country_code."""
     with open("config/payment_labels.yaml", encoding="utf-8") as f:
       FIELD_LABELS = yaml.safe_load(f)
@@ -282,7 +282,7 @@ def send_payment_block_to_chat(api, order_id: str, info: dict, country_code: str
 
 
     try:
-        api.send_chat_message(
+        await api.send_chat_message(
             message=message,
             contentType="str",
             orderId=order_id,
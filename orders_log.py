@@ -1,48 +1,17 @@
+import asyncio
 import logging
 import os
 from pprint import pprint
 from typing import Dict
 import uuid
-from supabase import create_client
 from language_detection import detect_country_from_name
 from order_utils import extract_payment_info, send_payment_block_to_chat, send_payment_info_to_chat
+from order_cache import get_order_cache
+from orders_store import get_orders_store
 
 logging.basicConfig(level=logging.INFO)
 
-def get_or_create_order_log(supabase, order):
-    order_id = order["id"]
-    logging.info(f"Checking log existence for order {order_id}")
-    existing = supabase.table("orders_log").select("*").eq("order_id", order_id).execute()
-    if existing.data and isinstance(existing.data[0], dict):
-        logging.info(f"Found existing log for order {order_id}")
-        return existing.data[0]
-
-    side = "BUY" if order["side"] == 0 else "SELL"
-
-    payload = {
-        "order_id": order_id,
-        "side": side,
-        "status": order["status"],
-        "price": float(order["price"]),
-        "amount": float(order["amount"]),
-        "quantity": float(order["notifyTokenQuantity"]),
-        "real_name": order.get("buyerRealName") if side == "BUY" else order.get("sellerRealName", ""),
-        "nickname": order.get("targetNickName") if side == "BUY" else order.get("nickName", ""),
-        "payment_data": order.get("confirmedPayTerm") or {},
-        "msg_status_10_sent": False,
-        "msg_status_20_sent": False,
-        "marked_paid": False,
-    }
-
-    logging.info(f"Inserting new log for order {order_id}")
-    inserted = supabase.table("orders_log").insert(payload).execute()
-    return inserted.data[0]
-
-def update_order_flag(supabase, order_id: str, field: str, value: bool):
-    logging.info(f"Updating order {order_id}: setting {field} = {value}")
-    supabase.table("orders_log").update({field: value}).eq("order_id", order_id).execute()
-
-def send_tutorial_photos_for_sell(api, order_id: str):
+async def send_tutorial_photos_for_sell(api, order_id: str):
     photo_dir = "./data/buy_tutorial_photo"
     for i in range(1, 9):
         filename = f"step_{i}.jpg"
@@ -52,10 +21,10 @@ def send_tutorial_photos_for_sell(api, order_id: str):
             continue
 
         try:
-            upload_response = api.upload_chat_file(upload_file=filepath)
+            upload_response = await api.upload_chat_file(upload_file=filepath)
             file_url = upload_response["result"]["url"]
 
-            send_response = api.send_chat_message(
+            send_response = await api.send_chat_message(
                 message=file_url,
                 contentType="pic",
                 orderId=order_id,
@@ -66,13 +35,13 @@ def send_tutorial_photos_for_sell(api, order_id: str):
         except Exception as e:
             logging.exception(f"[SELL PHOTOS] Failed to send {filename}: {e}")
 
-def send_multilang_messages(api, order_id: str, message_dict: Dict[str, str]):
+async def send_multilang_messages(api, order_id: str, message_dict: Dict[str, str]):
     """Send the same message in all provided languages to the order chat."""
     for lang, message in message_dict.items():
         if not message:
             continue
         try:
-            resp = api.send_chat_message(
+            resp = await api.send_chat_message(
                 message=message,
                 contentType="str",
                 orderId=order_id,
@@ -82,14 +51,103 @@ def send_multilang_messages(api, order_id: str, message_dict: Dict[str, str]):
         except Exception as e:
             logging.exception(f"[{lang}] Failed to send message to order {order_id}: {e}")
 
-def process_active_orders(api, config, side: str):
-    url = config["supabase"]["url"]
-    key = config["supabase"]["api_key"]
-    supabase = create_client(url, key)
+async def _process_order(api, config, side: str, order: Dict, store, details_cache, token_name: str):
+    """Один ордер: реквізити, повідомлення, mark_as_paid — строго послідовно"""
+    order_id = order["id"]
+    status = order["status"]
+    currency = order.get("currencyId")
+    
+    # Пропускаємо завершені ордери (статус 30, 40, 50, etc)
+    if status not in [10, 20]:
+        logging.info(f"Skipping order {order_id} with status {status} (completed/cancelled)")
+        return
+
+    logging.info(f"Handling order {order_id} with status {status}")
+    log = await store.get_or_create(order)
+
+    logging.info(f"Flags in log for order {order_id}: "
+     f"msg_status_10_sent={log.get('msg_status_10_sent')}, "
+     f"msg_status_20_sent={log.get('msg_status_20_sent')}, "
+     f"marked_paid={log.get('marked_paid')}")
+
+    if status == 10 and not log["msg_status_10_sent"]:
+      if not log["marked_paid"]:
+        # Деталі й реквізити — лише коли їх справді відправлятимемо: для SELL PLN
+        # extract_payment_info робить get_user_payment_types, а тік ордерів частий
+        order_details = await details_cache.get(api, order)
+
+        # ОНОВЛЕНО: Передаємо api і currency для правильної обробки SELL PLN
+        payment_info = await extract_payment_info(api, order_details, side, token_name, currency)
+        counterparty_full_name = order_details.get("sellerRealName" if side == "BUY" else "buyerRealName", "")
+        country_code = detect_country_from_name(counterparty_full_name)
+        pprint(f'{counterparty_full_name} --- {country_code}')
+
+        if currency == "PLN":
+            logging.info(f"[PAYMENT_SEND] Sending payment info for PLN order {order_id}")
+            
+            # Відправляємо як і раніше - окремими повідомленнями + блоком
+            await send_payment_info_to_chat(api, order_id, payment_info)
+            await send_payment_block_to_chat(api, order_id, payment_info, country_code, token_name)
+        else:
+            logging.info(f"[PAYMENT_SEND] Skipping payment data for order {order_id} — currency: {currency} (only PLN supported)")
+
+      logging.info(f"Sending status_10 message for order {order_id}")
+      messages = config["messages"].get("status_10", {}).get(side, {})
+
+      if messages:
+        # await send_multilang_messages(api, order_id, messages)
+        await store.set_flag(order_id, "msg_status_10_sent", True)
+
+    if side == "BUY" and status == 10 and not log["marked_paid"]:
+      logging.info(f"Marking order {order_id} as paid")
+      try:
+          # Ті самі деталі, що вище: статус не змінився, тож вони вже в кеші
+          order_details = await details_cache.get(api, order)
+          payment_terms = order_details.get("paymentTermList", [])
+          logging.info(f"Payment terms for order {order_id}: {payment_terms}")
+
+          if not payment_terms:
+              logging.error(f"[!] No payment terms found for order {order_id}, skipping mark_as_paid")
+              return
+
+          term = payment_terms[0]
+          response = await api.mark_as_paid(
+              orderId=str(order_id),
+              paymentType=str(term["paymentType"]),
+              paymentId=str(term["id"])
+          )
+          logging.info(f"mark_as_paid response: {response}")
+
+          await store.set_flag(order_id, "marked_paid", True)
+          details_cache.invalidate(order_id)
+          logging.info(f"Updated 'marked_paid' flag for order {order_id} to True")
+
+      except Exception as e:
+          logging.exception(f"[!] Failed to mark order {order_id} as paid: {e}")
+
+    if status == 20 and not log["msg_status_20_sent"]:
+        logging.info(f"Sending status_20 message for order {order_id}")
+        messages = config["messages"].get("status_20", {}).get(side, {})
+        if messages:
+            await send_multilang_messages(api, order_id, messages)
+            await store.set_flag(order_id, "msg_status_20_sent", True)
+
+_semaphore: asyncio.Semaphore | None = None
+
+def get_order_semaphore(config) -> asyncio.Semaphore:
+    """Один ліміт на процес: BUY і SELL разом обробляють не більше orders.concurrency ордерів"""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(int(config.get("orders", {}).get("concurrency", 4)))
+    return _semaphore
+
+async def process_active_orders(api, config, side: str):
+    store = get_orders_store(config)
+    details_cache = get_order_cache(config)
 
     logging.info(f"Processing active orders for side: {side}")
     try:
-        response = api.get_pending_orders(
+        response = await api.get_pending_orders(
             page=1,
             size=10,
             tokenId=config["p2p"]["token"],
@@ -99,94 +157,35 @@ def process_active_orders(api, config, side: str):
         logging.info(f"Fetched {len(orders)} pending orders for side {side}")
     except Exception as e:
         logging.error(f"Failed to fetch orders: {e}")
-        return
+        return 0
 
     # Отримуємо токен з конфігурації
     token_name = config["p2p"]["token"]
+
+    # Логи всіх активних ордерів тіку — одним пакетом (SQLite, решта з Supabase)
+    await store.load([o for o in orders if isinstance(o, dict) and o.get("status") in [10, 20]])
     
+    # Кожен ордер — окрема задача, одночасно не більше concurrency (спільно
+    # з іншою стороною); всередині ордера повідомлення йдуть по черзі,
+    # помилка одного ордера не зачіпає інші
+    semaphore = get_order_semaphore(config)
+
+    async def run_order(order):
+        async with semaphore:
+            try:
+                await _process_order(api, config, side, order, store, details_cache, token_name)
+            except Exception as e:
+                logging.error(f"[!] Failed to process order {order.get('id', '?')}: {e}")
+
+    valid_orders = []
     for order in orders:
         if not isinstance(order, dict):
             logging.error(f"Invalid order format: {order}")
             continue
+        valid_orders.append(order)
 
-        try:
-            order_id = order["id"]
-            status = order["status"]
-            currency = order.get("currencyId")
-            
-            # Пропускаємо завершені ордери (статус 30, 40, 50, etc)
-            if status not in [10, 20]:
-                logging.info(f"Skipping order {order_id} with status {status} (completed/cancelled)")
-                continue
-
-            # extracting and sending payment info to BUY order chat
-            order_details = api.get_order_details(orderId=order_id)["result"]
-
-            # ОНОВЛЕНО: Передаємо api і currency для правильної обробки SELL PLN
-            payment_info = extract_payment_info(api, order_details, side, token_name, currency)
-            counterparty_full_name = order_details.get("sellerRealName" if side == "BUY" else "buyerRealName", "")
-            country_code = detect_country_from_name(counterparty_full_name)
-            pprint(f'{counterparty_full_name} --- {country_code}')
-
-            logging.info(f"Handling order {order_id} with status {status}")
-            log = get_or_create_order_log(supabase, order)
-
-            logging.info(f"Flags in log for order {order_id}: "
-             f"msg_status_10_sent={log.get('msg_status_10_sent')}, "
-             f"msg_status_20_sent={log.get('msg_status_20_sent')}, "
-             f"marked_paid={log.get('marked_paid')}")
-
-            if status == 10 and not log["msg_status_10_sent"]:
-              if not log["marked_paid"]:
-                if currency == "PLN":
-                    logging.info(f"[PAYMENT_SEND] Sending payment info for PLN order {order_id}")
-                    
-                    # Відправляємо як і раніше - окремими повідомленнями + блоком
-                    send_payment_info_to_chat(api, order_id, payment_info)
-                    send_payment_block_to_chat(api, order_id, payment_info, country_code, token_name)
-                else:
-                    logging.info(f"[PAYMENT_SEND] Skipping payment data for order {order_id} — currency: {currency} (only PLN supported)")
-
-              logging.info(f"Sending status_10 message for order {order_id}")
-              messages = config["messages"].get("status_10", {}).get(side, {})
-
-              if messages:
-                # send_multilang_messages(api, order_id, messages)
-                update_order_flag(supabase, order_id, "msg_status_10_sent", True)
-
-            if side == "BUY" and status == 10 and not log["marked_paid"]:
-              logging.info(f"Marking order {order_id} as paid")
-              try:
-                  raw_response = api.get_order_details(orderId=order_id)
-                  details = raw_response.get("result", {})
-            
-                  payment_terms = details.get("paymentTermList", [])
-                  logging.info(f"Payment terms for order {order_id}: {payment_terms}")
-
-                  if not payment_terms:
-                      logging.error(f"[!] No payment terms found for order {order_id}, skipping mark_as_paid")
-                      continue
-
-                  term = payment_terms[0]
-                  response = api.mark_as_paid(
-                      orderId=str(order_id),
-                      paymentType=str(term["paymentType"]),
-                      paymentId=str(term["id"])
-                  )
-                  logging.info(f"mark_as_paid response: {response}")
-
-                  update_order_flag(supabase, order_id, "marked_paid", True)
-                  logging.info(f"Updated 'marked_paid' flag for order {order_id} to True")
-
-              except Exception as e:
-                  logging.exception(f"[!] Failed to mark order {order_id} as paid: {e}")
-
-            if status == 20 and not log["msg_status_20_sent"]:
-                logging.info(f"Sending status_20 message for order {order_id}")
-                messages = config["messages"].get("status_20", {}).get(side, {})
-                if messages:
-                    send_multilang_messages(api, order_id, messages)
-                    update_order_flag(supabase, order_id, "msg_status_20_sent", True)
+    await asyncio.gather(*(run_order(order) for order in valid_orders))
 
-        except Exception as e:
-            logging.error(f"[!] Failed to process order {order.get('id', '?')}: {e}")
+    # Зміни прапорців за тік — одною пачкою у фоні (і догнати Supabase, якщо він був недоступний)
+    store.schedule_sync()
+    return len(orders)
@@ -0,0 +1,264 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict
+
+import runtime_stats
+from supabase_client import SupabaseManager, get_supabase
+
+logger = logging.getLogger(__name__)
+
+FLAG_FIELDS = ("msg_status_10_sent", "msg_status_20_sent", "marked_paid")
+
+# upsert(on_conflict="order_id") потребує unique-обмеження на orders_log.order_id;
+# без нього PostgREST відповідає цим кодом (міграція — в supabase/migrations)
+NO_UNIQUE_CONSTRAINT = "42P10"
+MIGRATION_HINT = "supabase/migrations/20261018000000_orders_log_order_id_unique.sql"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders_log (
+    order_id TEXT PRIMARY KEY,
+    side TEXT,
+    status INTEGER,
+    price REAL,
+    amount REAL,
+    quantity REAL,
+    real_name TEXT,
+    nickname TEXT,
+    payment_data TEXT,
+    msg_status_10_sent INTEGER NOT NULL DEFAULT 0,
+    msg_status_20_sent INTEGER NOT NULL DEFAULT 0,
+    marked_paid INTEGER NOT NULL DEFAULT 0,
+    dirty INTEGER NOT NULL DEFAULT 0,
+    synced_at REAL
+)
+"""
+
+def order_log_payload(order: Dict) -> Dict:
+    """Новий рядок orders_log для ордера"""
+    side = "BUY" if order["side"] == 0 else "SELL"
+    return {
+        "order_id": order["id"],
+        "side": side,
+        "status": order["status"],
+        "price": float(order["price"]),
+        "amount": float(order["amount"]),
+        "quantity": float(order["notifyTokenQuantity"]),
+        "real_name": order.get("buyerRealName") if side == "BUY" else order.get("sellerRealName", ""),
+        "nickname": order.get("targetNickName") if side == "BUY" else order.get("nickName", ""),
+        "payment_data": order.get("confirmedPayTerm") or {},
+        "msg_status_10_sent": False,
+        "msg_status_20_sent": False,
+        "marked_paid": False,
+    }
+
+def fetch_order_logs(supabase, order_ids) -> list:
+    """Рядки orders_log для всіх order_ids одним запитом (in_)"""
+    if not order_ids:
+        return []
+    return supabase.table("orders_log").select("*").in_("order_id", list(order_ids)).execute().data
+
+def _log_missing_constraint(error: Exception):
+    if getattr(error, "code", None) == NO_UNIQUE_CONSTRAINT:
+        logger.error(f"[ORDERS_STORE] orders_log.order_id has no unique constraint, upserts cannot work — "
+                     f"apply {MIGRATION_HINT}")
+
+def get_or_create_order_logs(supabase, orders: list) -> list:
+    """
+    Пакетний get_or_create: один select на всі ордери, потім один upsert
+    для тих, кого ще немає (ignore_duplicates — чужий рядок не перезаписуємо).
+    Потрібен unique на orders_log.order_id (див. MIGRATION_HINT).
+    """
+    existing = {row["order_id"]: row for row in fetch_order_logs(supabase, [o["id"] for o in orders])}
+    logging.info(f"Found {len(existing)} existing logs for {len(orders)} orders")
+
+    new_rows = [order_log_payload(o) for o in orders if o["id"] not in existing]
+    if new_rows:
+        logging.info(f"Inserting {len(new_rows)} new order logs")
+        supabase.table("orders_log").upsert(new_rows, on_conflict="order_id", ignore_duplicates=True).execute()
+    return list(existing.values()) + new_rows
+
+def sync_order_logs(supabase, rows: list) -> list:
+    """
+    Доганяє Supabase локальними рядками: один select і один upsert на всю пачку.
+    Прапорці лише False -> True, тож злиття з віддаленим рядком — це OR.
+    Повертає рядки після злиття.
+    """
+    remote = {row["order_id"]: row for row in fetch_order_logs(supabase, [r["order_id"] for r in rows])}
+    merged = []
+    for row in rows:
+        current = remote.get(row["order_id"])
+        if current is not None:
+            row = {**row, **{f: bool(row[f] or current.get(f)) for f in FLAG_FIELDS}}
+        merged.append(row)
+    supabase.table("orders_log").upsert(merged, on_conflict="order_id").execute()
+    return merged
+
+class OrdersLogStore:
+    """
+    Локальне SQLite-дзеркало orders_log: гарячий шлях (перевірка прапорців,
+    їх виставлення) читає й пише лише SQLite.
+
+    - load / get_or_create: локальні рядки — одразу; решту одним пакетом
+      питаємо в Supabase (не довше remote_timeout), а якщо він повільний чи
+      недоступний — створюємо рядки локально й позначаємо dirty;
+    - set_flag: пишемо лише локально (dirty);
+    - schedule_sync (раз на тік): фонова задача (не більше однієї) штовхає
+      всі dirty-рядки в Supabase одним select + upsert і забирає звідти
+      прапорці, що там уже True. Після помилки наступна спроба — не раніше
+      ніж через sync_retry секунд.
+    """
+
+    def __init__(self, path: str, supabase: SupabaseManager, remote_timeout: float = 3.0,
+                 sync_retry: float = 30.0):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(_SCHEMA)
+        self._supabase = supabase
+        self._remote_timeout = remote_timeout
+        self._sync_retry = sync_retry
+        self._sync_task: asyncio.Task | None = None
+        self._retry_after = 0.0
+        self.stats = {"local_hits": 0, "remote_loads": 0, "local_creates": 0, "synced": 0, "sync_errors": 0}
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "OrdersLogStore":
+        cfg = config.get("orders_store", {})
+        return cls(
+            cfg.get("sqlite_path", "./data/orders_log.sqlite3"),
+            get_supabase(config),
+            remote_timeout=float(cfg.get("remote_timeout", 3)),
+            sync_retry=float(cfg.get("sync_retry", 30)),
+        )
+
+    def _get_local(self, order_id: str) -> Dict | None:
+        row = self._db.execute("SELECT * FROM orders_log WHERE order_id = ?", (order_id,)).fetchone()
+        if row is None:
+            return None
+        log = dict(row)
+        log["payment_data"] = json.loads(log["payment_data"] or "{}")
+        for field in FLAG_FIELDS:
+            log[field] = bool(log[field])
+        return log
+
+    def _put_local(self, log: Dict, dirty: bool):
+        self._db.execute(
+            """
+            INSERT INTO orders_log (order_id, side, status, price, amount, quantity, real_name, nickname,
+                                    payment_data, msg_status_10_sent, msg_status_20_sent, marked_paid,
+                                    dirty, synced_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(order_id) DO UPDATE SET
+                msg_status_10_sent = MAX(msg_status_10_sent, excluded.msg_status_10_sent),
+                msg_status_20_sent = MAX(msg_status_20_sent, excluded.msg_status_20_sent),
+                marked_paid = MAX(marked_paid, excluded.marked_paid),
+                dirty = MAX(dirty, excluded.dirty),
+                synced_at = COALESCE(excluded.synced_at, synced_at)
+            """,
+            (
+                str(log["order_id"]), log.get("side"), log.get("status"), log.get("price"), log.get("amount"),
+                log.get("quantity"), log.get("real_name"), log.get("nickname"),
+                json.dumps(log.get("payment_data") or {}, ensure_ascii=False),
+                int(bool(log.get("msg_status_10_sent"))), int(bool(log.get("msg_status_20_sent"))),
+                int(bool(log.get("marked_paid"))), int(dirty), None if dirty else time.time(),
+            ),
+        )
+
+    async def load(self, orders: list):
+        """
+        Підтягує в SQLite рядки для ордерів тіку, яких там ще немає: один
+        пакетний запит до Supabase (не довше remote_timeout). Якщо Supabase
+        повільний чи недоступний — рядки створюються локально як dirty.
+        """
+        missing = [o for o in orders if self._get_local(str(o["id"])) is None]
+        self.stats["local_hits"] += len(orders) - len(missing)
+        if not missing:
+            return
+
+        try:
+            rows = await asyncio.wait_for(
+                self._supabase.run(get_or_create_order_logs, missing), self._remote_timeout
+            )
+            self.stats["remote_loads"] += len(rows)
+            for row in rows:
+                self._put_local(row, dirty=False)
+        except Exception as e:
+            _log_missing_constraint(e)
+            logger.warning(f"[ORDERS_STORE] Supabase unavailable for {len(missing)} orders ({e!r}), logging locally")
+            self.stats["local_creates"] += len(missing)
+            for order in missing:
+                self._put_local(order_log_payload(order), dirty=True)
+
+    async def get_or_create(self, order: Dict) -> Dict:
+        order_id = str(order["id"])
+        log = self._get_local(order_id)
+        if log is None:
+            await self.load([order])
+            log = self._get_local(order_id)
+        return log
+
+    async def set_flag(self, order_id: str, field: str, value: bool):
+        """Лише локально; у Supabase зміни тіку йдуть однією пачкою (schedule_sync)"""
+        logging.info(f"Updating order {order_id}: setting {field} = {value} (local)")
+        self._db.execute(
+            f"UPDATE orders_log SET {field} = ?, dirty = 1 WHERE order_id = ?", (int(value), str(order_id))
+        )
+
+    def schedule_sync(self):
+        """Фонова синхронізація dirty-рядків, якщо вона ще не йде і не на паузі після помилки"""
+        if self._sync_task is not None and not self._sync_task.done():
+            return
+        if time.monotonic() < self._retry_after:
+            return
+        if self._db.execute("SELECT 1 FROM orders_log WHERE dirty = 1 LIMIT 1").fetchone() is None:
+            return
+        self._sync_task = asyncio.create_task(self.sync())
+
+    async def sync(self):
+        rows = [dict(row) for row in self._db.execute("SELECT * FROM orders_log WHERE dirty = 1").fetchall()]
+        if not rows:
+            return
+        for row in rows:
+            row.pop("dirty")
+            row.pop("synced_at")
+            row["payment_data"] = json.loads(row["payment_data"] or "{}")
+            for field in FLAG_FIELDS:
+                row[field] = bool(row[field])
+
+        try:
+            merged = await self._supabase.run(sync_order_logs, rows)
+        except Exception as e:
+            _log_missing_constraint(e)
+            self.stats["sync_errors"] += 1
+            self._retry_after = time.monotonic() + self._sync_retry
+            logger.warning(f"[ORDERS_STORE] Sync of {len(rows)} orders failed ({e!r}), "
+                           f"retry in {self._sync_retry:.0f}s")
+            return
+
+        for row, remote in zip(rows, merged):
+            # Рядок міг змінитись, поки йшов запит, — dirty знімаємо лише
+            # якщо локальні прапорці ті самі, що ми відправили
+            self._db.execute(
+                f"""UPDATE orders_log SET dirty = 0, synced_at = ?
+                    WHERE order_id = ? AND {' AND '.join(f'{f} = ?' for f in FLAG_FIELDS)}""",
+                (time.time(), row["order_id"], *(int(row[f]) for f in FLAG_FIELDS)),
+            )
+            self._put_local(remote, dirty=False)
+        self.stats["synced"] += len(rows)
+        logger.info(f"[ORDERS_STORE] Synced {len(rows)} orders to Supabase")
+
+_store: OrdersLogStore | None = None
+
+def get_orders_store(config: Dict) -> OrdersLogStore:
+    """Одне дзеркало на процес"""
+    global _store
+    if _store is None:
+        _store = OrdersLogStore.from_config(config)
+        runtime_stats.register("orders_store", _store.stats)
+    return _store
@@ -0,0 +1,60 @@
+import logging
+from typing import Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+# Ключ у dict оголошення, куди один раз (при завантаженні знімку)
+# кладеться бітова маска його payments
+MASK_KEY = "_paymentMask"
+
+class PaymentRegistry:
+    """
+    paymentType ('159', '154', '133', ...) -> номер біта.
+
+    Біти видаються при першій появі типу й більше не змінюються, тож маски,
+    закодовані раніше, лишаються валідними. Перетин способів оплати —
+    це `a & b`, кількість спільних — `(a & b).bit_count()`.
+    """
+
+    def __init__(self):
+        self._bits: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._bits)
+
+    def encode(self, payments: Iterable) -> int:
+        """Маска для payments оголошення; нові типи отримують свій біт"""
+        mask = 0
+        for payment in payments:
+            bit = self._bits.get(payment)
+            if bit is None:
+                bit = self._bits[payment] = len(self._bits)
+            mask |= 1 << bit
+        return mask
+
+    def query(self, payments: Iterable) -> int:
+        """Маска для запиту: невідомі типи не збігаються з жодним оголошенням"""
+        mask = 0
+        for payment in payments:
+            bit = self._bits.get(payment)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def decode(self, mask: int) -> List[str]:
+        return [payment for payment, bit in self._bits.items() if mask >> bit & 1]
+
+payment_registry = PaymentRegistry()
+
+def payment_mask(ad: Dict) -> int:
+    """Маска способів оплати оголошення (кодується при першому зверненні)"""
+    mask = ad.get(MASK_KEY)
+    if mask is None:
+        mask = ad[MASK_KEY] = payment_registry.encode(ad.get("payments", []))
+    return mask
+
+def index_payments(ads: List[Dict]) -> List[Dict]:
+    """Кодує payments усіх оголошень знімку при завантаженні; повертає той самий список"""
+    for ad in ads:
+        payment_mask(ad)
+    return ads
@@ -0,0 +1,75 @@
+import logging
+from typing import Dict, List
+
+from ads import has_flag, update_ad_dynamic
+from calc_price import find_prices_by_payment_sets, payment_independent_config, to_float
+from market_state import MarketState
+
+logger = logging.getLogger(__name__)
+
+# Рішення тіку репрайсингу для однієї сторони: ціни для #p і оновлення #p/#q.
+# Без глобалів main (api, config, market_state передаються явно), тож ту саму
+# логіку проганяє й офлайн-реплей (tools/replay.py).
+
+async def process_ads_with_flags(api, config: Dict, ads: List[Dict], side: str, market_ads: list, quantity,
+                                 side_config: Dict, price_offset: float,
+                                 market_state: MarketState | None = None):
+    """Обробляє оголошення з флагами #p та #q"""
+    prices = calculate_ad_prices(
+        config, [ad for ad in ads if has_flag(ad, "#p")], side, market_ads, side_config, price_offset,
+        market_state
+    )
+    await apply_ad_prices(api, ads, prices, quantity)
+    return last_flagged_price(ads, prices)
+
+def last_flagged_price(ads: List[Dict], prices: Dict):
+    """Ціна останнього #p оголошення — її BUY передає SELL як reference_buy_price"""
+    last_price = None
+    for ad in ads:
+        if has_flag(ad, "#p"):
+            last_price = prices[ad["id"]]
+    return last_price
+
+async def apply_ad_prices(api, ads: List[Dict], prices: Dict, quantity):
+    """update_ad для #p/#q оголошень з уже порахованими цінами (calculate_ad_prices)"""
+    for ad in ads:
+        if not has_flag(ad, "#p") and not has_flag(ad, "#q"):
+            continue
+
+        price = prices[ad["id"]] if has_flag(ad, "#p") else None
+        quantity_to_update = quantity if has_flag(ad, "#q") else None
+        await update_ad_dynamic(api, ad, price=price, quantity=quantity_to_update)
+
+def calculate_ad_prices(config: Dict, ads: List[Dict], side: str, market_ads: list, side_config: Dict,
+                        price_offset: float, market_state: MarketState | None = None) -> Dict:
+    """
+    Розраховує ціни для оголошень пакетом: оголошення з однаковим набором
+    способів оплати отримують одну ціну, порахована вона один раз.
+    Повертає {ad id: ціна}.
+    """
+    if not ads:
+        return {}
+
+    payment_sets = {}
+    for ad in ads:
+        payments = [str(term["paymentType"]) for term in ad.get("paymentTerms", [])]
+        logger.info(f"[{side}] Payments for ad {ad['id']}: {payments}")
+        payment_sets[ad["id"]] = tuple(sorted(payments))
+
+    verdicts = None
+    if market_state is not None:
+        verdicts = market_state.verdicts(side, payment_independent_config(side_config))
+
+    prices = find_prices_by_payment_sets(
+        ads_list=market_ads,
+        side_config=side_config,
+        payment_sets=payment_sets.values(),
+        side_code=config["p2p"]["side_codes"][side],
+        price_gap=to_float(config["pricing"]["price_gap"]),
+        fallback_price=side_config["fallback_price"],
+        verdicts=verdicts
+    )
+    return {
+        ad_id: round(prices[payment_set] + price_offset, 2)
+        for ad_id, payment_set in payment_sets.items()
+    }
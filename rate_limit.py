@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Пріоритети: менше число — важливіше
+PRIORITY_ORDERS = 0
+PRIORITY_ADS = 1
+PRIORITY_MARKET = 2
+
+# endpoint -> (група з власним бакетом, пріоритет)
+ENDPOINT_GROUPS: Dict[str, Tuple[str, int]] = {
+    "mark_as_paid": ("orders", PRIORITY_ORDERS),
+    "send_chat_message": ("orders", PRIORITY_ORDERS),
+    "upload_chat_file": ("orders", PRIORITY_ORDERS),
+    "get_order_details": ("orders", PRIORITY_ORDERS),
+    "get_pending_orders": ("orders", PRIORITY_ORDERS),
+    "get_user_payment_types": ("orders", PRIORITY_ORDERS),
+    "update_ad": ("ads", PRIORITY_ADS),
+    "get_ads_list": ("ads", PRIORITY_ADS),
+    "get_current_balance": ("ads", PRIORITY_ADS),
+    "get_online_ads": ("market", PRIORITY_MARKET),
+}
+
+DEFAULT_GROUP = ("default", PRIORITY_ADS)
+
+# Частка глобального бюджету, яку пріоритет не може з'їсти —
+# вона лишається для важливіших викликів
+DEFAULT_RESERVE = {PRIORITY_ORDERS: 0.0, PRIORITY_ADS: 0.2, PRIORITY_MARKET: 0.4}
+
+# Коди Bybit, після яких варто пригальмувати групу
+RATE_LIMIT_CODES = {403, 429, 10006, 10018}
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, need: float) -> float:
+        """Скільки чекати, поки в бакеті буде need токенів (після refill)"""
+        return max(0.0, (need - self.tokens) / self.rate)
+
+class RateGovernor:
+    """
+    Token bucket на кожну групу ендпоінтів + спільний глобальний бакет.
+
+    Пріоритети: ордери (mark_as_paid, чат) > оголошення (update_ad) > скан ринку.
+    Нижчий пріоритет бере глобальний токен лише якщо після цього лишиться
+    його reserve-частка бюджету, і не обганяє вищий пріоритет, який уже чекає.
+    Коли бюджету мало, низькопріоритетні виклики відкладаються (чекають),
+    а не падають з FailedRequestError.
+    """
+
+    def __init__(self, groups: Dict[str, Tuple[float, float]], global_rate: float, global_burst: float,
+                 reserve: Dict[int, float] | None = None):
+        self._buckets = {name: TokenBucket(rate, burst) for name, (rate, burst) in groups.items()}
+        self._global = TokenBucket(global_rate, global_burst)
+        self._reserve = reserve or DEFAULT_RESERVE
+        self._waiting: Counter = Counter()
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "RateGovernor":
+        cfg = config.get("rate_limits", {})
+        defaults = {"orders": (5, 10), "ads": (2, 5), "market": (5, 10), "default": (2, 5)}
+        groups = {}
+        for name, (rate, burst) in defaults.items():
+            group_cfg = cfg.get(name, {})
+            groups[name] = (float(group_cfg.get("rate", rate)), float(group_cfg.get("burst", burst)))
+        global_cfg = cfg.get("global", {})
+        groups["global"] = (float(global_cfg.get("rate", 10)), float(global_cfg.get("burst", 20)))
+        for name, (rate, burst) in groups.items():
+            # rate 0 — wait_time ділить на нуль, burst < 1 — токен ніколи не набереться
+            if rate <= 0 or burst < 1:
+                raise ValueError(f"rate_limits.{name}: rate must be > 0 and burst >= 1, got {rate}/{burst}")
+        global_rate, global_burst = groups.pop("global")
+        return cls(groups, global_rate=global_rate, global_burst=global_burst)
+
+    def _higher_priority_waiting(self, priority: int) -> bool:
+        return any(count for p, count in self._waiting.items() if p < priority)
+
+    async def acquire(self, endpoint: str):
+        group, priority = ENDPOINT_GROUPS.get(endpoint, DEFAULT_GROUP)
+        bucket = self._buckets.get(group) or self._buckets[DEFAULT_GROUP[0]]
+        # Не більше за burst: інакше при малому burst global_need недосяжний
+        global_need = min(1 + self._reserve.get(priority, 0.0) * self._global.burst, self._global.burst)
+        started = time.monotonic()
+        deferred = False
+
+        # У _waiting рахуємо лише тих, кого тримає глобальний бюджет
+        queued = False
+        try:
+            while True:
+                bucket.refill()
+                self._global.refill()
+                if bucket.tokens >= 1:
+                    if not self._higher_priority_waiting(priority) and self._global.tokens >= global_need:
+                        bucket.tokens -= 1
+                        self._global.tokens -= 1
+                        break
+                    if not queued:
+                        self._waiting[priority] += 1
+                        queued = True
+                elif queued:
+                    self._waiting[priority] -= 1
+                    queued = False
+
+                deferred = True
+                delay = max(bucket.wait_time(1), self._global.wait_time(global_need), 0.01)
+                await asyncio.sleep(min(delay, 1.0))
+        finally:
+            if queued:
+                self._waiting[priority] -= 1
+
+        waited = time.monotonic() - started
+        s = self.stats.setdefault(group, {"acquired": 0, "deferred": 0, "wait_time": 0.0})
+        s["acquired"] += 1
+        if deferred:
+            s["deferred"] += 1
+            s["wait_time"] += waited
+            logger.debug(f"[RATE] {endpoint} deferred {waited:.2f}s (group={group}, priority={priority})")
+
+    def backoff(self, endpoint: str):
+        """Bybit сказав «забагато» — обнуляємо бакет групи, наступні виклики почекають"""
+        group, _ = ENDPOINT_GROUPS.get(endpoint, DEFAULT_GROUP)
+        bucket = self._buckets.get(group)
+        if bucket is not None:
+            bucket.refill()
+            bucket.tokens = min(bucket.tokens, 0.0)
+            logger.warning(f"[RATE] Rate limit hit on {endpoint}, backing off group {group}")
@@ -0,0 +1,102 @@
+import re
+from collections import OrderedDict
+from typing import Dict, Iterable, Tuple
+
+import runtime_stats
+
+# Скільки вердиктів (ad id, hash ремарки) пам'ятає один матчер щонайменше;
+# під глибокий стакан кеш росте через fit()
+VERDICT_CACHE_SIZE = 4096
+# Скільки різних blacklist-ів тримаємо скомпільованими
+_MATCHERS_CACHE_SIZE = 16
+
+def _trie_pattern(node: Dict) -> str:
+    # "" у вузлі — тут закінчується слово: префікс уже збіг, далі не йдемо
+    if "" in node:
+        return ""
+    alternatives = [re.escape(ch) + _trie_pattern(child) for ch, child in sorted(node.items())]
+    return alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+
+def compile_blacklist(words: Iterable[str]) -> "re.Pattern | None":
+    """
+    Слова -> префіксне дерево -> одна регулярка (дерево Aho-Corasick без
+    suffix-посилань; переходи по дереву робить C-рушій re, а не Python).
+    На кожній позиції ремарки перевіряється лише гілка її першої літери.
+    """
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+    return re.compile(_trie_pattern(trie)) if trie else None
+
+class RemarkMatcher:
+    """
+    Скомпільований remark_blacklist: усі слова — одна регулярка-дерево,
+    тож ремарка проходиться один раз, а не по разу на кожне слово.
+    Семантика та сама, що `any(word in remark for word in words)`:
+    підрядок, з урахуванням регістру (ремарку знижує викликач).
+
+    Вердикти кешуються за (ad id, hash ремарки): та сама ремарка того ж
+    оголошення в наступних тіках не сканується, змінена — сканується знову.
+    Стакан щотіку сканується в тому ж порядку, тож LRU, менший за стакан,
+    не влучає зовсім — місткість підганяється під розмір стакану (fit).
+    """
+
+    def __init__(self, words: Iterable[str]):
+        self.words = tuple(words)
+        self._pattern = compile_blacklist(self.words)
+        self._verdicts: "OrderedDict[Tuple, bool]" = OrderedDict()
+        self.capacity = VERDICT_CACHE_SIZE
+        self.stats: Dict[str, int] = {"hits": 0, "scans": 0}
+
+    def fit(self, book_size: int):
+        """Місткість на два стакани book_size: BUY і SELL можуть ділити один матчер"""
+        self.capacity = max(self.capacity, 2 * book_size)
+
+    def matches(self, remark: str) -> bool:
+        """True, якщо в ремарці є хоч одне слово з blacklist"""
+        return self._pattern is not None and self._pattern.search(remark) is not None
+
+    def is_clean(self, ad_id, remark: str) -> bool:
+        if ad_id is None:
+            self.stats["scans"] += 1
+            return not self.matches(remark)
+
+        key = (ad_id, hash(remark))
+        verdict = self._verdicts.get(key)
+        if verdict is not None:
+            self.stats["hits"] += 1
+            self._verdicts.move_to_end(key)
+            return verdict
+
+        self.stats["scans"] += 1
+        verdict = self._verdicts[key] = not self.matches(remark)
+        if len(self._verdicts) > self.capacity:
+            self._verdicts.popitem(last=False)
+        return verdict
+
+_matchers: "OrderedDict[Tuple[str, ...], RemarkMatcher]" = OrderedDict()
+
+def get_matcher(words: Iterable[str]) -> RemarkMatcher:
+    """Один матчер на blacklist: той самий список слів — той самий об'єкт і кеш вердиктів"""
+    key = tuple(words)
+    matcher = _matchers.get(key)
+    if matcher is None:
+        matcher = _matchers[key] = RemarkMatcher(key)
+        if len(_matchers) > _MATCHERS_CACHE_SIZE:
+            _matchers.popitem(last=False)
+    else:
+        _matchers.move_to_end(key)
+    return matcher
+
+def matcher_stats() -> Dict[str, int]:
+    """Сумарно по всіх матчерах (для runtime_stats)"""
+    return {
+        "matchers": len(_matchers),
+        "hits": sum(m.stats["hits"] for m in _matchers.values()),
+        "scans": sum(m.stats["scans"] for m in _matchers.values()),
+    }
+
+runtime_stats.register("remark_filter", matcher_stats)
@@ -0,0 +1,53 @@
+import logging
+import time
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+# Лічильники компонентів процесу (API, rate limit, кеші, Supabase) в одному місці.
+# Компонент реєструє свій stats-словник (або функцію, що його повертає) один
+# раз — у своєму get_x(config); звідси їх читають періодичний лог (order_loop)
+# і відповідь /status у Telegram.
+
+_sources: Dict[str, Callable[[], Dict]] = {}
+_last_logged = 0.0
+
+def register(name: str, stats):
+    """stats — словник лічильників (читається живим) або функція, що його повертає"""
+    _sources[name] = stats if callable(stats) else (lambda: stats)
+
+def snapshot() -> Dict[str, Dict]:
+    return {name: source() for name, source in _sources.items()}
+
+def _format_value(value) -> str:
+    return f"{value:.3f}" if isinstance(value, float) else str(value)
+
+def _format_line(name: str, stats: Dict) -> str:
+    parts = [f"{key}={_format_value(value)}" for key, value in stats.items()]
+    # Середній час — там, де є кількість викликів і сумарний час
+    count = stats.get("calls", stats.get("requests"))
+    if count and "total_time" in stats:
+        parts.append(f"avg_time={stats['total_time'] / count:.3f}")
+    return f"{name}: {' '.join(parts)}"
+
+def format_lines(stats: Dict[str, Dict] | None = None) -> list:
+    """По рядку на компонент; вкладені словники (по ендпоінту, по групі) — окремими рядками"""
+    lines = []
+    for name, values in (snapshot() if stats is None else stats).items():
+        if not values:
+            continue
+        if all(isinstance(v, dict) for v in values.values()):
+            lines.extend(_format_line(f"{name}.{sub}", sub_stats) for sub, sub_stats in values.items())
+        else:
+            lines.append(_format_line(name, values))
+    return lines
+
+def maybe_log(interval: float):
+    """Пише всі лічильники в лог, якщо з минулого разу пройшло не менше interval секунд"""
+    global _last_logged
+    now = time.monotonic()
+    if interval <= 0 or now - _last_logged < interval:
+        return
+    _last_logged = now
+    for line in format_lines():
+        logger.info(f"[STATS] {line}")
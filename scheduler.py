@@ -0,0 +1,59 @@
+import logging
+from typing import Dict, List
+
+from market_ad import MarketAd
+
+logger = logging.getLogger(__name__)
+
+class TickScheduler:
+    """
+    Адаптивний інтервал між тіками замість фіксованого sleep(30).
+
+    Протягом тіку сторони повідомляють, що бачили (observe_book / observe_orders).
+    Якщо є відкриті ордери або змінився верх стакану — наступний тік
+    через min_interval. Якщо ринок тихий — інтервал росте в growth разів
+    до max_interval.
+    """
+
+    def __init__(self, min_interval: float = 5.0, max_interval: float = 60.0, growth: float = 1.5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.growth = growth
+        self.interval = min_interval
+        self._top_of_book: Dict[str, tuple] = {}
+        self._book_changed = False
+        self._pending_orders = 0
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "TickScheduler":
+        cfg = config.get("scheduler", {})
+        return cls(
+            min_interval=float(cfg.get("min_interval", 5)),
+            max_interval=float(cfg.get("max_interval", 60)),
+            growth=float(cfg.get("growth", 1.5)),
+        )
+
+    def observe_book(self, side: str, market_ads: List[MarketAd]):
+        """Запам'ятовує верх стакану сторони; зміна відносно минулого тіку — сигнал"""
+        top = (market_ads[0].id, market_ads[0].price) if market_ads else None
+        if side in self._top_of_book and self._top_of_book[side] != top:
+            self._book_changed = True
+        self._top_of_book[side] = top
+
+    def observe_orders(self, side: str, count: int):
+        self._pending_orders += count
+
+    def next_interval(self) -> float:
+        """Рахує інтервал до наступного тіку і скидає сигнали цього тіку"""
+        if self._pending_orders or self._book_changed:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.growth, self.max_interval)
+
+        logger.info(
+            f"💤 Next tick in {self.interval:.1f}s "
+            f"(pending_orders={self._pending_orders}, book_changed={self._book_changed})"
+        )
+        self._book_changed = False
+        self._pending_orders = 0
+        return self.interval
@@ -0,0 +1,42 @@
+-- orders_log.order_id має бути унікальним: orders_store робить пакетний
+-- upsert(on_conflict="order_id"), а PostgREST без unique-обмеження на цій
+-- колонці відповідає 42P10 і жоден upsert не проходить.
+-- Міграція ідемпотентна: повторний запуск нічого не змінює.
+
+-- 1. Дублікати order_id (старий select + insert міг їх створити в гонці):
+--    прапорці зливаємо через OR, лишаємо один рядок на ордер
+update orders_log o
+set msg_status_10_sent = m.msg_status_10_sent,
+    msg_status_20_sent = m.msg_status_20_sent,
+    marked_paid = m.marked_paid
+from (
+    select order_id,
+           coalesce(bool_or(msg_status_10_sent), false) as msg_status_10_sent,
+           coalesce(bool_or(msg_status_20_sent), false) as msg_status_20_sent,
+           coalesce(bool_or(marked_paid), false) as marked_paid
+    from orders_log
+    group by order_id
+    having count(*) > 1
+) m
+where o.order_id = m.order_id;
+
+delete from orders_log o
+using orders_log d
+where o.order_id = d.order_id
+  and o.ctid > d.ctid;
+
+-- 2. Unique-обмеження, якщо на order_id ще немає унікального індексу (чи PK)
+do $$
+begin
+    if not exists (
+        select 1
+        from pg_index i
+        join pg_attribute a on a.attrelid = i.indrelid and a.attnum = i.indkey[0]
+        where i.indrelid = 'orders_log'::regclass
+          and i.indisunique
+          and i.indnatts = 1
+          and a.attname = 'order_id'
+    ) then
+        alter table orders_log add constraint orders_log_order_id_key unique (order_id);
+    end if;
+end $$;
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Dict
+
+import httpx
+from supabase import Client, ClientOptions, create_client
+
+import runtime_stats
+
+logger = logging.getLogger(__name__)
+
+class SupabaseManager:
+    """
+    Один Supabase-клієнт на процес замість create_client на кожен тік.
+
+    Клієнт створюється ліниво при першому запиті й далі перевикористовується
+    разом зі своїм httpx-пулом (keep-alive з'єднання до PostgREST).
+    Запити йдуть у потоці (sync-клієнт), тож event loop не блокується.
+
+    Якщо запит упав на транспорті (з'єднання, таймаут) — клієнт скидається
+    і запит повторюється один раз на новому. Помилки PostgREST (APIError)
+    пробрасуються як є. Після простою довше health_check_interval перед
+    запитом робиться дешевий ping; невдалий ping теж перестворює клієнт.
+    """
+
+    def __init__(self, url: str, key: str, timeout: float = 10.0, health_check_interval: float = 300.0):
+        self._url = url
+        self._key = key
+        self._timeout = timeout
+        self._health_check_interval = health_check_interval
+        self._client: Client | None = None
+        self._lock = threading.Lock()
+        self._last_ok = 0.0
+        self.stats = {
+            "setup_time": 0.0,
+            "setups": 0,
+            "requests": 0,
+            "errors": 0,
+            "reconnects": 0,
+            "total_time": 0.0,
+            "max_time": 0.0,
+        }
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "SupabaseManager":
+        cfg = config["supabase"]
+        return cls(
+            cfg["url"],
+            cfg["api_key"],
+            timeout=float(cfg.get("timeout", 10)),
+            health_check_interval=float(cfg.get("health_check_interval", 300)),
+        )
+
+    def _get_client(self) -> Client:
+        with self._lock:
+            if self._client is None:
+                started = time.perf_counter()
+                self._client = create_client(
+                    self._url, self._key, options=ClientOptions(postgrest_client_timeout=self._timeout)
+                )
+                elapsed = time.perf_counter() - started
+                self.stats["setups"] += 1
+                self.stats["setup_time"] += elapsed
+                logger.info(f"[SUPABASE] Client created in {elapsed:.3f}s")
+            return self._client
+
+    def _reset(self, reason: Exception):
+        with self._lock:
+            self._client = None
+        self.stats["reconnects"] += 1
+        logger.warning(f"[SUPABASE] Connection problem ({reason!r}), client will be recreated")
+
+    def _ping(self, client: Client):
+        client.table("orders_log").select("order_id").limit(1).execute()
+
+    def _healthy_client(self) -> Client:
+        client = self._get_client()
+        if self._last_ok and time.monotonic() - self._last_ok > self._health_check_interval:
+            try:
+                self._ping(client)
+            except httpx.TransportError as e:
+                self._reset(e)
+                client = self._get_client()
+        return client
+
+    def _run_sync(self, func: Callable, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            try:
+                result = func(self._healthy_client(), *args, **kwargs)
+            except httpx.TransportError as e:
+                self._reset(e)
+                result = func(self._get_client(), *args, **kwargs)
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stats["requests"] += 1
+            self.stats["total_time"] += elapsed
+            self.stats["max_time"] = max(self.stats["max_time"], elapsed)
+        self._last_ok = time.monotonic()
+        return result
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """func(client, *args, **kwargs) у потоці — як get_or_create_order_log / update_order_flag"""
+        return await asyncio.to_thread(self._run_sync, func, *args, **kwargs)
+
+_manager: SupabaseManager | None = None
+
+def get_supabase(config: Dict) -> SupabaseManager:
+    """Один менеджер (і клієнт) на процес"""
+    global _manager
+    if _manager is None:
+        _manager = SupabaseManager.from_config(config)
+        runtime_stats.register("supabase", _manager.stats)
+    return _manager
@@ -1,4 +1,5 @@
 # telegram_bot.py
+import html
 import yaml
 import aiofiles
 from functools import wraps
@@ -10,6 +11,7 @@ from aiogram.client.default import DefaultBotProperties
 
 from config import config  # тільки для Telegram токена
 from config import config as initial_config
+import runtime_stats
 
 # === Конфіг (динамічний) ===
 config_state = initial_config.copy()
@@ -58,7 +60,9 @@ async def stop_bot(message: Message):
 @only_owner
 async def status(message: Message):
     state = '✅ ON' if running_flags["main_loop"] else '❌ OFF'
-    await message.answer(f"BOT: {state}")
+    lines = runtime_stats.format_lines()
+    stats = f"\n<pre>{html.escape(chr(10).join(lines))}</pre>" if lines else ""
+    await message.answer(f"BOT: {state}{stats}")
 
 @dp.message(Command("upload_config"))
 @only_owner
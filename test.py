@@ -1,23 +1,17 @@
+import asyncio
 import json
 from pathlib import Path
 from pprint import pprint
-from api_client import get_api
+from ads import fetch_market_snapshot
+from api_client import get_async_api
 from config import config
 import json
 # from language_detection import enrich_names_with_country, get_country_code_from_name
 
-api = get_api(config)
+api = get_async_api(config)
 
-def test_function():
-  sell_ads = api.get_online_ads(
-      tokenId="USDT",
-      currencyId="PLN",
-      side="1",
-      page="1",
-      size="100",
-  )
-    
-  ads_list = sell_ads.get("result", {}).get("items", [])
+async def test_function():
+  ads_list = await fetch_market_snapshot(api, config, "SELL")
 
   for ad in ads_list:
       if float(ad.get("quantity", 0)) > 500:
@@ -25,4 +19,4 @@ def test_function():
           pprint(f"{ad['nickName']} - {ad['price']} {ad['payments']}")
 
 
-test_function()
\ No newline at end of file
+asyncio.run(test_function())
\ No newline at end of file
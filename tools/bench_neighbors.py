@@ -0,0 +1,64 @@
+"""
+Порівняння пошуку сусіда: лінійний _find_neighbor_price проти NeighborIndex.
+
+Запуск з кореня репозиторію:
+    python -m tools.bench_neighbors
+"""
+import json
+import random
+import time
+
+from calc_price import NeighborIndex, _find_neighbor_price
+from market_ad import MarketAd
+
+FIXTURES = [
+    "buy_ads.json",
+    "stupid_JSONs/sell_ads.json",
+]
+GAPS = [0.0, 0.01, 0.05, 0.1]
+SCALES = [1, 5, 20]
+
+def load_ads(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def scaled(ads: list, factor: int) -> list:
+    """Копії стакану з трохи зсунутими цінами й унікальними нікнеймами"""
+    rng = random.Random(factor)
+    result = []
+    for i in range(factor):
+        for ad in ads:
+            copy = dict(ad)
+            copy["nickName"] = f"{ad['nickName']}#{i}" if i else ad["nickName"]
+            copy["price"] = f"{float(ad['price']) + rng.choice([-0.02, -0.01, 0, 0.01, 0.02]) * (i > 0):.2f}"
+            result.append(copy)
+    return result
+
+def linear_verdicts(ads, gap, side_code):
+    return [_find_neighbor_price(ad, ads, gap, side_code) for ad in ads]
+
+def index_verdicts(ads, gap, side_code):
+    index = NeighborIndex(ads)
+    return [index.has_neighbor(ad.price, ad.nick_name, gap, side_code) for ad in ads]
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+def main():
+    print(f"{'fixture':<28} {'side':>4} {'ads':>6} {'gap':>5} {'linear, s':>10} {'index, s':>10} {'speedup':>8}  match")
+    for path in FIXTURES:
+        base = load_ads(path)
+        for factor in SCALES:
+            ads = [MarketAd(ad) for ad in scaled(base, factor)]
+            for side_code in (0, 1):
+                for gap in GAPS:
+                    expected, t_linear = timed(linear_verdicts, ads, gap, side_code)
+                    got, t_index = timed(index_verdicts, ads, gap, side_code)
+                    match = "ok" if expected == got else "MISMATCH"
+                    speedup = t_linear / t_index if t_index else float("inf")
+                    print(f"{path:<28} {side_code:>4} {len(ads):>6} {gap:>5} {t_linear:>10.4f} {t_index:>10.4f} {speedup:>7.1f}x  {match}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Бенчмарк ціноутворення на записаних стаканах.
+
+Фікстури (buy_ads.json, stupid_JSONs/sell_ads.json, data/filtered_sell_adds.json)
+та їх синтетичні копії на 1k/10k/100k оголошень проганяються з day- і
+night-конфігом. Окремо міряються: розбір у MarketAd, фільтр (python і, якщо
+є numpy, numpy), пошук сусіда через NeighborIndex і весь find_price_from_config.
+Кожен повтор іде з холодними кешами (вердикти ремарок, скомпільовані правила,
+_paymentMask у сирих оголошеннях) — як перший тік на новому знімку, інакше
+parse і filter міряли б теплий кеш і не ловили б регресій.
+Результат — JSON (stdout або --output), щоб порівнювати прогони між комітами.
+
+Запуск з кореня репозиторію:
+    python -m tools.bench_pricing
+    python -m tools.bench_pricing --sizes 1000 10000 --repeat 3 --output bench.json
+"""
+import argparse
+import json
+import logging
+import platform
+import random
+import statistics
+import time
+
+import yaml
+
+import calc_price
+import calc_price_np
+import remark_filter
+from calc_price import NeighborIndex, _filter_ads, _find_price_in_list, find_price_from_config, to_float
+from market_ad import MarketAd
+from payment_index import MASK_KEY
+
+# (шлях, сторона стакану)
+FIXTURES = [
+    ("buy_ads.json", "BUY"),
+    ("stupid_JSONs/sell_ads.json", "SELL"),
+    ("data/filtered_sell_adds.json", "SELL"),
+]
+CONFIGS = {
+    "day": "data/day_config.yaml",
+    "night": "data/night_config.yaml",
+}
+SIDE_CODES = {"BUY": 0, "SELL": 1}
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+def load_ads(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        ads = json.load(f)
+    return [_as_market_dict(ad) for ad in ads]
+
+def _as_market_dict(ad: dict) -> dict:
+    """data/filtered_sell_adds.json — пласкі записи з ads_tools; приводимо до формату get_online_ads"""
+    if "payments" in ad:
+        return ad
+    return {
+        **ad,
+        "payments": ad.get("paymentTypes", []),
+        "lastQuantity": ad.get("quantity"),
+        "tradingPreferenceSet": {
+            "registerTimeThreshold": ad.get("registerTimeThreshold"),
+            "orderFinishNumberDay30": ad.get("orderFinishNumberDay30"),
+        },
+    }
+
+def synthetic(ads: list, size: int) -> list:
+    """Стакан на size оголошень: копії фікстури з унікальними id/нікнеймами і трохи зсунутими цінами"""
+    rng = random.Random(size)
+    result = []
+    copy_no = 0
+    while len(result) < size:
+        for ad in ads:
+            if len(result) >= size:
+                break
+            copy = {k: v for k, v in ad.items() if not k.startswith("_")}
+            if copy_no:
+                copy["id"] = f"{ad.get('id')}-{copy_no}"
+                copy["nickName"] = f"{ad.get('nickName')}#{copy_no}"
+                copy["price"] = f"{to_float(ad.get('price')) + rng.choice([-0.02, -0.01, 0, 0.01, 0.02]):.2f}"
+            result.append(copy)
+        copy_no += 1
+    return result
+
+def load_config(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+def cold_caches(raw_ads: list):
+    """Скидає кеші, що переживають повтор: вердикти ремарок (разом з матчерами
+    й ланцюжками правил, які їх тримають) і маски оплат у сирих оголошеннях"""
+    remark_filter._matchers.clear()
+    calc_price._compiled_rules.clear()
+    for ad in raw_ads:
+        ad.pop(MASK_KEY, None)
+
+def timed(func, repeat: int, reset=None):
+    times = []
+    result = None
+    for _ in range(repeat):
+        if reset is not None:
+            reset()
+        started = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - started)
+    return result, times
+
+def bench_case(raw_ads: list, side_config: dict, side_code: int, price_gap: float, repeat: int) -> list:
+    rows = []
+    fallback = side_config.get("fallback_price", 0)
+    reset = lambda: cold_caches(raw_ads)
+
+    def row(stage, times, **extra):
+        rows.append({
+            "stage": stage,
+            "min_s": min(times),
+            "mean_s": statistics.fmean(times),
+            "repeat": len(times),
+            **extra,
+        })
+
+    ads, times = timed(lambda: [MarketAd(ad) for ad in raw_ads], repeat, reset)
+    row("parse", times)
+
+    modes = ["python"] + (["numpy"] if calc_price_np.is_available() else [])
+    for mode in modes:
+        cfg = {**side_config, "filter_mode": mode}
+        if mode == "numpy":
+            # Колонки будуються раз на знімок — міряємо їх окремо від масок
+            _, times = timed(lambda: calc_price_np.MarketColumns(ads), repeat)
+            row("numpy_columns", times)
+            calc_price_np.get_columns(ads)
+        filtered, times = timed(lambda: _filter_ads(ads, cfg, None, side_code), repeat, reset)
+        row("filter", times, mode=mode, filtered=len(filtered))
+
+    filtered = _filter_ads(ads, side_config, None, side_code)
+    index, times = timed(lambda: NeighborIndex(filtered), repeat)
+    row("neighbor_index", times, filtered=len(filtered))
+    price, times = timed(lambda: _find_price_in_list(filtered, filtered, price_gap, side_code, index), repeat)
+    row("neighbor_search", times, price=price)
+
+    price, times = timed(
+        lambda: find_price_from_config(ads, side_config, side_code, price_gap, fallback), repeat, reset
+    )
+    row("end_to_end", times, price=price)
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="*", default=DEFAULT_SIZES,
+                        help="розміри синтетичних стаканів (оригінальні фікстури міряються завжди)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="куди писати JSON (за замовчуванням stdout)")
+    args = parser.parse_args()
+
+    # find_price_from_config логує кожне відфільтроване оголошення — у бенчмарку це шум
+    logging.disable(logging.CRITICAL)
+
+    results = []
+    for config_name, config_path in CONFIGS.items():
+        config = load_config(config_path)
+        price_gap = to_float(config["pricing"]["price_gap"])
+        for fixture, side in FIXTURES:
+            base = load_ads(fixture)
+            side_config = {**config[side], "filter_stats": False, "filter_rule_order": "config"}
+            for size in [len(base)] + list(args.sizes):
+                raw_ads = base if size == len(base) else synthetic(base, size)
+                repeat = args.repeat if size <= 10000 else max(1, args.repeat // 2)
+                for r in bench_case(raw_ads, side_config, SIDE_CODES[side], price_gap, repeat):
+                    results.append({
+                        "fixture": fixture,
+                        "config": config_name,
+                        "side": side,
+                        "size": len(raw_ads),
+                        **r,
+                    })
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": getattr(calc_price_np.np, "__version__", None),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
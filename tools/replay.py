@@ -0,0 +1,167 @@
+"""
+Офлайн-реплей тіків репрайсингу: записані стакани проганяються через ту
+саму логіку, що й у main (pricing.process_ads_with_flags ->
+find_prices_by_payment_sets -> update_ad_dynamic), але без мережі —
+update_ad лише записується і застосовується до локальної копії оголошення.
+
+Вхід — файли в порядку тіків:
+  *.json  — один знімок get_online_ads (масив оголошень), сторона з поля
+            "side" оголошень (0 — BUY, 1 — SELL) або з --side;
+  *.jsonl — по тіку на рядок: {"side": "BUY", "market": [...],
+            "my_ads": [...]?, "quantity": 123.4?}.
+Якщо my_ads не записані, для сторони береться одне синтетичне оголошення
+з "#p #q" і способами оплати з allowed_payment_types конфігу.
+
+На виході JSON: ціна й кількість викликів update_ad на кожен тік,
+час обчислення тіку і зведення (p50/p95/max).
+
+Запуск з кореня репозиторію:
+    python -m tools.replay buy_ads.json stupid_JSONs/sell_ads.json --loops 3
+    python -m tools.replay ticks.jsonl --config data/night_config.yaml --output replay.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+
+import yaml
+
+from market_ad import parse_snapshot
+from market_state import MarketState
+from pricing import process_ads_with_flags
+
+SIDE_NAMES = {0: "BUY", 1: "SELL"}
+PRICE_OFFSETS = {"BUY": 0.01, "SELL": -0.01}  # як у main.process_side
+
+class ReplayApi:
+    """Замість AsyncP2P: update_ad нікуди не йде, а змінює локальне оголошення"""
+
+    def __init__(self, my_ads: dict):
+        self.my_ads = my_ads  # side -> [ad]
+        self.calls = []
+
+    async def update_ad(self, **params):
+        self.calls.append(params)
+        for ads in self.my_ads.values():
+            for ad in ads:
+                if ad["id"] == params["id"]:
+                    ad.update(
+                        price=str(params["price"]),
+                        quantity=str(params["quantity"]),
+                        minAmount=params["minAmount"],
+                        maxAmount=params["maxAmount"],
+                        status=10,
+                    )
+        return {"ret_code": 0, "result": {}}
+
+def load_ticks(paths: list, side: str | None) -> list:
+    ticks = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            if path.endswith(".jsonl"):
+                ticks.extend(json.loads(line) for line in f if line.strip())
+                continue
+            market = json.load(f)
+        tick_side = side or (SIDE_NAMES.get(market[0].get("side")) if market else None)
+        if tick_side is None:
+            raise ValueError(f"Cannot tell the side of {path}, pass --side")
+        ticks.append({"side": tick_side, "market": market})
+    return ticks
+
+def synthetic_my_ad(side: str, side_config: dict, quantity: float) -> dict:
+    return {
+        "id": f"replay-{side}",
+        "remark": "#p #q",
+        "status": 10,
+        "price": str(side_config.get("fallback_price", 0)),
+        "quantity": str(quantity),
+        "minAmount": "100",
+        "maxAmount": "1000",
+        "paymentTerms": [
+            {"id": f"term-{payment}", "paymentType": payment}
+            for payment in side_config.get("allowed_payment_types", [])
+        ],
+        "tradingPreferenceSet": {},
+        "paymentPeriod": 15,
+    }
+
+async def replay(config: dict, ticks: list, loops: int) -> dict:
+    market_state = MarketState()
+    my_ads = {}
+    api = ReplayApi(my_ads)
+    last_buy_price = None
+    rows = []
+
+    for loop in range(loops):
+        for n, tick in enumerate(ticks):
+            side = tick["side"]
+            side_config = config[side]
+            quantity = tick.get("quantity", 1000.0)
+            if "my_ads" in tick and side not in my_ads:
+                my_ads[side] = [dict(ad) for ad in tick["my_ads"]]
+            ads = my_ads.setdefault(side, [synthetic_my_ad(side, side_config, quantity)])
+            if side == "SELL" and last_buy_price is not None:
+                side_config = {**side_config, "reference_buy_price": last_buy_price}
+
+            calls_before = len(api.calls)
+            started = time.perf_counter()
+            market_ads = parse_snapshot(tick["market"])
+            market_state.update(side, market_ads)
+            price = await process_ads_with_flags(
+                api, config, ads, side, market_ads, quantity, side_config, PRICE_OFFSETS[side], market_state
+            )
+            elapsed = time.perf_counter() - started
+
+            if side == "BUY":
+                last_buy_price = price or 0
+            rows.append({
+                "loop": loop,
+                "tick": n,
+                "side": side,
+                "market_size": len(market_ads),
+                "price": price,
+                "update_calls": len(api.calls) - calls_before,
+                "latency_ms": elapsed * 1000,
+            })
+
+    latencies = sorted(r["latency_ms"] for r in rows) or [0.0]
+    return {
+        "ticks": rows,
+        "summary": {
+            "ticks": len(rows),
+            "update_calls": len(api.calls),
+            "latency_ms": {
+                "p50": statistics.median(latencies),
+                "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                "max": latencies[-1],
+            },
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="знімки (.json) або тіки (.jsonl) у порядку реплею")
+    parser.add_argument("--config", default="data/day_config.yaml")
+    parser.add_argument("--side", choices=["BUY", "SELL"], help="сторона для .json без поля side")
+    parser.add_argument("--loops", type=int, default=1, help="скільки разів прогнати всю послідовність")
+    parser.add_argument("--output", help="куди писати JSON (за замовчуванням stdout)")
+    parser.add_argument("--verbose", action="store_true", help="логи фільтра та update_ad")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+
+    report = asyncio.run(replay(config, load_ticks(args.inputs, args.side), args.loops))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()